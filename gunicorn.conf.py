@@ -0,0 +1,22 @@
+"""
+Gunicorn settings of the dashboard.
+
+Usage: DASHBOARD_SHARED_DATA=/tmp/dashboard-data gunicorn src.app:server
+
+With DASHBOARD_SHARED_DATA set, the master process writes the processed sales data
+and its cubes to a memory-mappable snapshot before the workers
+start. Every worker maps the same read-only files, so memory stays flat as workers
+are added and a restarted worker does not re-read the parquet file.
+"""
+
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Build the shared data snapshot once, before the workers are forked
+def on_starting(server):
+    shared_dir = os.environ.get('DASHBOARD_SHARED_DATA')
+    if shared_dir:
+        from src.data import DATA_PATH
+        from src.shared import prepare_shared_data
+        prepare_shared_data(DATA_PATH, shared_dir)
@@ -1,52 +1,163 @@
+import os
+from functools import lru_cache
 import dash_bootstrap_components as dbc
 from dash import Dash, html, dcc
-from .data import import_data, import_geojson, preprocess_data
+from flask import jsonify
+from .data import DATA_PATH, dataset_version, import_data, import_geojson, memory_report, preprocess_data
+from .shared import load_shared_data
+from .store import SalesStore
+from .backends import DuckDBBackend
+from .ingest import BatchWatcher, LiveData, build_snapshot
+from .cache import FigureCache
+from .timing import CallbackTimings, instrument
+from .trace import record_traces
+from .warmup import default_specs, frequent_specs, start_warmup
+from .figures import create_base_map
 from .components import create_footer, create_filters, create_metrics, create_visuals
-from flask_caching import Cache
+
+# Directory of the background callback jobs; if set, the heavy callbacks run as background jobs
+BACKGROUND_DIR = os.environ.get('DASHBOARD_BACKGROUND_DIR')
+
+# Run the heavy callbacks in processes of their own, so a superseded one can be terminated
+background_manager = None
+if BACKGROUND_DIR:
+    import diskcache  # optional, only needed for background callbacks
+    from dash import DiskcacheManager
+    # results are collected by the browser within seconds, keep them for 10 minutes at most
+    background_manager = DiskcacheManager(diskcache.Cache(BACKGROUND_DIR), expire=600)
 
 # Initialize the app
 app = Dash(
     __name__, 
     external_stylesheets=[dbc.themes.YETI],
-    title="Amazon Sales Dashboard")
+    title="Amazon Sales Dashboard",
+    background_callback_manager=background_manager)
 server = app.server
 
-# Import data
-df = import_data('data/processed/amazon_in_sales.parquet')
-india = import_geojson('https://naciscdn.org/naturalearth/50m/cultural/ne_50m_admin_1_states_provinces.zip')
+# Directory of the snapshot shared by all workers, see gunicorn.conf.py
+SHARED_DATA_DIR = os.environ.get('DASHBOARD_SHARED_DATA')
+# Log of the served filter states, the most frequent ones are warmed at startup
+SPEC_LOG = os.environ.get('DASHBOARD_SPEC_LOG')
+# Directory watched for new batches of summarized sales, see ingest.py
+INBOX_DIR = os.environ.get('DASHBOARD_INBOX')
+# Number of most recent months held in memory, older ones are read from disk when needed
+HOT_MONTHS = os.environ.get('DASHBOARD_HOT_MONTHS')
+# Trace of the callback inputs of real sessions, replayed by utils/replay_trace.py
+TRACE_PATH = os.environ.get('DASHBOARD_TRACE')
+# Query backend: "pandas" holds the data in memory, "duckdb" queries the parquet files in place
+BACKEND = os.environ.get('DASHBOARD_BACKEND', 'pandas')
+
+# Version of the sales data, every cached artifact is keyed by it
+data_version = dataset_version(DATA_PATH)
+
+# Import data and preprocessed data, mapped from the shared snapshot or only the recent months if configured
+backend, map_states = None, None
+if BACKEND == 'duckdb':
+    backend = DuckDBBackend(DATA_PATH, memory_limit=os.environ.get('DASHBOARD_DUCKDB_MEMORY'))
+    df, preprocessed_data, map_states = None, backend.preprocess(), backend.states()
+elif SHARED_DATA_DIR:
+    df, preprocessed_data = load_shared_data(DATA_PATH, SHARED_DATA_DIR, data_version)
+elif HOT_MONTHS:
+    store = SalesStore(DATA_PATH, max(int(HOT_MONTHS), 1))
+    df, preprocessed_data, backend = store.load()
+    map_states = store.states
+else:
+    df = import_data(DATA_PATH)
+    preprocessed_data = preprocess_data(df)
+if df is not None:
+    report = memory_report(df, preprocessed_data)
+    print(f"Holding {report.loc['total', 'bytes'] / 1024 ** 2:.2f} MB of sales data and cubes")
+india = import_geojson('data/geo/india_states_medium.geojson')
+
+# Current snapshot of the data, swapped when new batches are ingested
+live_data = LiveData(build_snapshot(df, preprocessed_data, data_version, map_states, backend=backend))
 
-# Preprocessed data
-preprocessed_data = preprocess_data(df)
-status_mapping = preprocessed_data["status_mapping"]
-month_labels = preprocessed_data["month_labels"]
-week_labels = preprocessed_data["week_labels"]
+# Map figure with the state geometry, sent once per session and patched afterwards
+@lru_cache(maxsize=2)
+def get_base_map(states):
+    return create_base_map(india, list(states))
+
+get_base_map(tuple(live_data.current.map_states))
 
 # Create Components
 metrics = create_metrics()
-filters = create_filters(month_labels, week_labels, status_mapping)
-visuals = create_visuals()
 footer = create_footer()
 
-# Layout
-app.layout = dbc.Container([
-    dcc.Store(id="filter_condition", data={}),
-    dbc.Row([
-        dbc.Col(filters, width=3),
-        dbc.Col([metrics, html.Br(), visuals], width=9, style={"margin-top": "10px"})],align="start", className="mb-4"), 
-    footer], 
-    fluid=True)
-
-cache = Cache(
-    app.server,
-    config={
-        'CACHE_TYPE': 'filesystem',
-        'CACHE_DIR': 'tmp'
-    }
+# Layout, built for every page load so new sessions get the current slider labels and states
+def serve_layout():
+    snapshot = live_data.current
+    filters = create_filters(snapshot.month_labels, snapshot.week_labels, snapshot.status_mapping)
+    visuals = create_visuals(get_base_map(tuple(snapshot.map_states)))
+    return dbc.Container([
+        dcc.Store(id="filter_condition", data={}),
+        dbc.Row([
+            dbc.Col(filters, width=3),
+            dbc.Col([metrics, html.Br(), visuals], width=9, style={"margin-top": "10px"})],align="start", className="mb-4"), 
+        footer], 
+        fluid=True)
+
+app.layout = serve_layout
+
+# Cache of the chart callback outputs, bounded in memory and on disk
+figure_cache = FigureCache(
+    directory=os.environ.get('DASHBOARD_CACHE_DIR', 'tmp'),
+    version=data_version,
+    max_entries=256,
+    max_disk_bytes=256 * 1024 ** 2,
+    ttl=24 * 3600
 )
 
+# Hit, miss and eviction counters of the figure cache, per callback
+@server.route('/_dash-cache-stats')
+def cache_stats():
+    return jsonify(figure_cache.stats())
+
+# Latency of the callbacks per stage, also sent to the browser in a Server-Timing header
+callback_timings = CallbackTimings()
+instrument(app, callback_timings)
+
+# Rolling percentiles of the latency stages and response sizes, per callback
+@server.route('/_dash-metrics')
+def callback_metrics():
+    return jsonify(callback_timings.summary())
+
+# Record the inputs of the served callbacks if configured
+if TRACE_PATH:
+    record_traces(app, TRACE_PATH)
+
 # Import callbacks to register them with the app
 from . import callbacks
 
+# Dash copies the callbacks into the app in a before-request hook, without a lock, so the
+# concurrent first requests of a new worker could find none: set the server up now instead
+app._setup_server()
+
+chart_callbacks = [callbacks.create_map, callbacks.create_sales_chart, callbacks.create_product_chart]
+
+# Warm the caches for the default and most frequent filter states, without blocking serving
+if os.environ.get('DASHBOARD_WARMUP', '1') == '1':
+    snapshot = live_data.current
+    start_warmup(
+        default_specs(snapshot.month_labels, snapshot.week_labels, snapshot.status_mapping) + frequent_specs(SPEC_LOG),
+        snapshot.queries,
+        chart_callbacks
+    )
+
+# Switch the caches to the new data version after an ingestion, and warm them again
+def refresh_caches(snapshot):
+    figure_cache.set_version(snapshot.version)
+    if os.environ.get('DASHBOARD_WARMUP', '1') == '1':
+        start_warmup(default_specs(snapshot.month_labels, snapshot.week_labels, snapshot.status_mapping),
+                     snapshot.queries, chart_callbacks)
+
+live_data.on_swap(refresh_caches)
+
+# Ingest new batches dropped in the inbox while serving
+if INBOX_DIR and BACKEND == 'duckdb':
+    print("DASHBOARD_INBOX is ignored with the duckdb backend, regenerate the processed data instead")
+elif INBOX_DIR:
+    BatchWatcher(INBOX_DIR, live_data, interval=float(os.environ.get('DASHBOARD_INBOX_INTERVAL', 30))).start()
+
 # Run the app/dashboard
 if __name__ == '__main__':
     app.run(debug=False)
\ No newline at end of file
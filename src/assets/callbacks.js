@@ -0,0 +1,56 @@
+window.dash_clientside = window.dash_clientside || {};
+
+// Callbacks that only map filter values to styles, strings or the filter spec.
+// They run in the browser so they don't need a round-trip to the server.
+window.dash_clientside.dashboard = {
+
+    // Show the monthly or weekly range slider and its label
+    toggleTimeSelectionVisibility: function(timeGranularity) {
+        const shown = {"display": "block"};
+        const hidden = {"display": "none"};
+        const shownLabel = {"display": "block", "color": "white", "font-weight": "bold"};
+
+        if (timeGranularity === "Monthly") {
+            return [shown, hidden, shownLabel, hidden];
+        }
+        return [hidden, shown, hidden, shownLabel];
+    },
+
+    // Header of the sales chart for the selected granularity
+    updateSalesChartHeader: function(timeGranularity) {
+        return timeGranularity === "Monthly" ? "Monthly Sales" : "Weekly Sales";
+    },
+
+    // Build the canonical filter spec, same form as FilterSpec.to_dict in src/filters.py
+    buildFilterSpec: function(dateSliderValue, weekRangeValue, promoFilter, fulfillmentFilter,
+                              selectedStatuses, clickData, timeGranularity, maxMonth, maxWeek) {
+        const monthly = timeGranularity === "Monthly";
+        const rangeValue = (monthly ? dateSliderValue : weekRangeValue) || [null, null];
+        const maxIndex = monthly ? maxMonth : maxWeek;
+        const start = rangeValue[0];
+        const end = rangeValue[1];
+
+        if (start === null || start === undefined || end === null || end === undefined ||
+            start < 0 || end > maxIndex || start > end) {
+            return null;
+        }
+
+        let state = null;
+        if (clickData && clickData.points) {
+            state = clickData.points[0].location || null;
+        }
+
+        // sorted and de-duplicated, so equivalent selections give the same spec
+        const statuses = Array.from(new Set(selectedStatuses || [])).sort();
+
+        return {
+            "granularity": timeGranularity,
+            "start": Math.round(start),
+            "end": Math.round(end),
+            "promo": Boolean(promoFilter),
+            "fulfilment": fulfillmentFilter,
+            "statuses": statuses,
+            "state": state
+        };
+    }
+};
@@ -0,0 +1,362 @@
+import atexit
+import os
+import threading
+from abc import ABC, abstractmethod
+import pandas as pd
+from .cube import CUBE_DIMENSIONS, CUBE_MEASURES
+from .data import STATUS_MAPPING, month_over_month
+from .kpis import period_totals
+
+# Time column of each granularity
+TIME_COLUMNS = {"Monthly": "year_month", "Weekly": "year_week"}
+
+class QueryBackend(ABC):
+    """
+    Interface of the aggregation backends of the query engine.
+
+    A backend filters the sales data, sums the measures (Amount, Qty, order_count)
+    over a range of periods and groups them by period or by a dimension. Conditions
+    are the filter engine conditions on the dimensions, see
+    `FilterSpec.dimension_conditions`; periods are slider indexes of a granularity.
+    """
+
+    @abstractmethod
+    def totals(self, granularity, start, end, conditions):
+        """
+        Grand totals of every measure over a period range.
+
+        Args:
+            granularity (str): "Monthly" or "Weekly".
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            conditions (dict): Filter conditions on the dimensions.
+
+        Returns:
+            dict: Mapping of measure to its total.
+        """
+
+    @abstractmethod
+    def series(self, granularity, start, end, conditions, by=None):
+        """
+        Totals of every measure for each period of a range.
+
+        Args:
+            granularity (str): "Monthly" or "Weekly".
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            conditions (dict): Filter conditions on the dimensions.
+            by (str): Optional dimension to also group by, e.g. "Status".
+
+        Returns:
+            pd.DataFrame: One row per period (labelled by the time column), or per
+                period and value of `by`, with one column per measure.
+        """
+
+    @abstractmethod
+    def rollup(self, granularity, start, end, by, conditions, top=None):
+        """
+        Totals of every measure over a period range, grouped by one dimension.
+
+        Args:
+            granularity (str): "Monthly" or "Weekly".
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            by (str): Dimension to group by, e.g. "state".
+            conditions (dict): Filter conditions on the dimensions.
+            top (int): Only keep the values with the largest Amount, largest first.
+
+        Returns:
+            pd.DataFrame: One row per value of the dimension (sorted, including those
+                without sales), one column per measure.
+        """
+
+# Largest values of a rollup
+def top_values(rollup, top):
+    """
+    Keep the values of a rollup with the largest Amount.
+
+    Args:
+        rollup (pd.DataFrame): Rollup of a backend, in value order.
+        top (int): Number of values to keep, None to keep them all.
+
+    Returns:
+        pd.DataFrame: The rollup, largest first and ties in value order if `top` is given.
+    """
+    if top is None:
+        return rollup
+    return rollup.sort_values('Amount', ascending=False, kind='stable').head(top)
+
+class CubeBackend(QueryBackend):
+    """
+    In-memory backend: every sum comes from the cubes.
+
+    With a SalesStore the cubes only hold its recent months at first. The first
+    query reaching a period the older months contribute to sums them into the
+    cubes, once, before answering; no query is answered from part of the data.
+    """
+
+    def __init__(self, cubes, store=None):
+        """
+        Args:
+            cubes (dict): Mapping of time granularity to its DataCube.
+            store (SalesStore): Store whose months left on disk are not in the cubes yet.
+        """
+        self.cubes = cubes
+        self.store = store
+        self._lock = threading.Lock()
+        # first period of each granularity the months left on disk do not contribute to
+        self._first_hot = {}
+        if store is not None:
+            for granularity, cube in cubes.items():
+                cold = [i for i, period in enumerate(cube.periods) if period in store.cold_periods[granularity]]
+                self._first_hot[granularity] = max(cold) + 1 if cold else 0
+
+    def _cube(self, granularity, start):
+        # the cube of a granularity, complete for the periods from start on
+        if self.store is not None and start < self._first_hot[granularity]:
+            with self._lock:
+                if self.store is not None:
+                    cold_rows = self.store.read_cold()
+                    self.cubes = {name: cube.extended(cold_rows, cube.periods) for name, cube in self.cubes.items()}
+                    self.store = None
+        return self.cubes[granularity]
+
+    def extended(self, new_rows, periods):
+        """
+        Build the backend of the sales data with rows appended, see `DataCube.extended`.
+
+        Args:
+            new_rows (pd.DataFrame): Rows appended to the sales data.
+            periods (dict): Mapping of time granularity to its period labels, including new periods.
+
+        Returns:
+            CubeBackend: The backend of the extended cubes, still reading the older months when needed.
+        """
+        with self._lock:
+            cubes, store = self.cubes, self.store
+        return CubeBackend({granularity: cube.extended(new_rows, periods[granularity])
+                            for granularity, cube in cubes.items()}, store)
+
+    def totals(self, granularity, start, end, conditions):
+        return self._cube(granularity, start).totals(start, end, conditions)
+
+    def series(self, granularity, start, end, conditions, by=None):
+        return self._cube(granularity, start).series(start, end, conditions, by=by)
+
+    def rollup(self, granularity, start, end, by, conditions, top=None):
+        return top_values(self._cube(granularity, start).rollup(start, end, by, conditions), top)
+
+# SQL string literal of a value
+def sql_string(value):
+    """
+    Quote a value as an SQL string literal, for the statements that take no parameters
+    (e.g. CREATE VIEW).
+
+    Args:
+        value (str): The value, e.g. a file path.
+
+    Returns:
+        str: The quoted literal, with its quotes doubled.
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+class DuckDBBackend(QueryBackend):
+    """
+    Backend querying the parquet file or partitioned dataset in place with an
+    embedded DuckDB database.
+
+    Nothing is loaded up front: every query scans the files, reading only the
+    columns, partitions and row groups it needs, on all cores. Aggregations larger
+    than `memory_limit` spill to a temporary directory instead of failing.
+    """
+
+    def __init__(self, url, memory_limit=None, threads=None):
+        """
+        Args:
+            url (str): File path to the parquet file, or to a dataset partitioned by month.
+            memory_limit (str): Memory DuckDB may use, e.g. "2GB", by default 80% of the RAM.
+            threads (int): Number of threads of a query, by default the number of cores.
+        """
+        self.url = url
+        self.memory_limit = memory_limit
+        self.threads = threads
+        self._closed = False
+        self._connect()
+        # a query still running in a daemon thread (e.g. the warmup) aborts the interpreter at exit
+        atexit.register(self.close)
+
+        self.periods = {}
+        self.values = {}
+        for granularity, column in TIME_COLUMNS.items():
+            labels = self._query(f'SELECT DISTINCT "{column}" FROM sales')[column].tolist()
+            if column == "year_week":
+                self.periods[granularity] = sorted(labels, key=lambda x: pd.to_datetime(x.split('/')[0]))
+            else:
+                self.periods[granularity] = sorted(labels)
+        for column in CUBE_DIMENSIONS:
+            self.values[column] = sorted(self._query(f'SELECT DISTINCT "{column}" FROM sales '
+                                                     f'WHERE "{column}" IS NOT NULL')[column].tolist())
+
+    def _connect(self):
+        # open the database of this process, with the view over the files
+        import duckdb  # optional, only needed for this backend
+
+        # settings as connection options, checked by DuckDB rather than spliced into SQL
+        config = {}
+        if self.memory_limit:
+            config['memory_limit'] = str(self.memory_limit)
+        if self.threads:
+            config['threads'] = int(self.threads)
+        self._connection = duckdb.connect(config=config)
+        self._connection.execute(f"CREATE VIEW sales AS SELECT * FROM read_parquet({self._source()})")
+        self._local = threading.local()
+        self._cursors = []
+        self._pid = os.getpid()
+
+    def _source(self):
+        # arguments of read_parquet for the file or every file of the dataset
+        if os.path.isdir(self.url):
+            return f"{sql_string(os.path.join(self.url, '**', '*.parquet'))}, hive_partitioning = true"
+        return sql_string(self.url)
+
+    def _query(self, sql, parameters=None):
+        # a connection is not shared between threads, every thread gets its own cursor
+        if self._closed:
+            raise RuntimeError("the DuckDB backend is closed")
+        if os.getpid() != self._pid:
+            # a database is not usable after a fork (e.g. a background callback job), open another one
+            self._connect()
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self._connection.cursor()
+            self._cursors.append(cursor)
+        return cursor.execute(sql, parameters or []).df()
+
+    def close(self):
+        """
+        Interrupt the running queries and close the database, if not closed yet.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for cursor in self._cursors:
+            cursor.interrupt()
+        # the database stays open as long as one of its cursors does
+        for cursor in self._cursors:
+            cursor.close()
+        self._connection.close()
+
+    def _where(self, conditions, granularity=None, start=None, end=None):
+        """
+        Build the WHERE clause of filter conditions and a period range.
+
+        Args:
+            conditions (dict): Filter conditions.
+            granularity (str): "Monthly" or "Weekly", None for no period range.
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+
+        Returns:
+            tuple: SQL clause and its parameters.
+        """
+        clauses, parameters = [], []
+        if granularity is not None:
+            periods = self.periods[granularity][start:end + 1]
+            # the labels sort chronologically, so the range is a BETWEEN the row groups can be pruned on
+            clauses.append(f'"{TIME_COLUMNS[granularity]}" BETWEEN ? AND ?')
+            parameters += [periods[0], periods[-1]]
+            if granularity == "Weekly":
+                # the months of the weeks, to prune the partitions
+                clauses.append('"year_month" BETWEEN ? AND ?')
+                parameters += [periods[0][:7], periods[-1].split('/')[-1][:7]]
+        for column, accepted in conditions.items():
+            if isinstance(accepted, (list, tuple, set, frozenset)):
+                accepted = list(accepted)
+                if not accepted:
+                    clauses.append('FALSE')
+                    continue
+                clauses.append(f'"{column}" IN ({", ".join("?" * len(accepted))})')
+                parameters += accepted
+            else:
+                clauses.append(f'"{column}" = ?')
+                parameters.append(accepted)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), parameters
+
+    def _sums(self, group_by, conditions, granularity, start, end, top=None):
+        """
+        Sum the measures of the matching rows, grouped by some columns.
+
+        Args:
+            group_by (list): Columns to group by, empty for the grand totals.
+            conditions (dict): Filter conditions.
+            granularity (str): "Monthly" or "Weekly".
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            top (int): Only return the groups with the largest Amount, ties in group order.
+
+        Returns:
+            pd.DataFrame: One row per group with sales, indexed by the group columns.
+        """
+        where, parameters = self._where(conditions, granularity, start, end)
+        columns = ", ".join(f'"{column}"' for column in group_by)
+        measures = ", ".join(
+            f'COALESCE(SUM("{measure}"), 0)::{"DOUBLE" if measure == "Amount" else "BIGINT"} AS "{measure}"'
+            for measure in CUBE_MEASURES)
+        if not group_by:
+            return self._query(f"SELECT {measures} FROM sales {where}", parameters)
+        order = f' ORDER BY "Amount" DESC, {columns} LIMIT {int(top)}' if top is not None else ""
+        sums = self._query(f"SELECT {columns}, {measures} FROM sales {where} GROUP BY {columns}{order}", parameters)
+        return sums.set_index(group_by)
+
+    def totals(self, granularity, start, end, conditions):
+        sums = self._sums([], conditions, granularity, start, end)
+        return {measure: sums[measure].iloc[0].item() for measure in CUBE_MEASURES}
+
+    def series(self, granularity, start, end, conditions, by=None):
+        column = TIME_COLUMNS[granularity]
+        periods = self.periods[granularity][start:end + 1]
+        if by is None:
+            index = pd.Index(periods, name=column)
+        else:
+            index = pd.MultiIndex.from_product([periods, self.values[by]], names=[column, by])
+        sums = self._sums([column] + ([by] if by else []), conditions, granularity, start, end)
+        return sums.reindex(index, fill_value=0)
+
+    def rollup(self, granularity, start, end, by, conditions, top=None):
+        sums = self._sums([by], conditions, granularity, start, end, top=top)
+        values = self.values[by]
+        if top is not None:
+            # the largest values with sales, and the first values without any that may tie with them
+            without_sales = [value for value in values if value not in sums.index][:top]
+            kept = set(sums.index).union(without_sales)
+            values = [value for value in values if value in kept]
+        return top_values(sums.reindex(pd.Index(values, name=by), fill_value=0), top)
+
+    def states(self):
+        """
+        States of the sales data, in order of appearance in the files.
+
+        Returns:
+            list: State names.
+        """
+        states = self._query('SELECT "state", MIN({"file": filename, "row": file_row_number}) AS first '
+                             f"FROM read_parquet({self._source()}, filename = true, file_row_number = true) "
+                             'GROUP BY "state" ORDER BY first')
+        return states['state'].tolist()
+
+    def preprocess(self):
+        """
+        Labels and month-over-month KPIs of the sales data, as from `preprocess_data`,
+        without the in-memory cubes.
+
+        Returns:
+            dict: Status mapping, period labels and month-over-month KPIs.
+        """
+        months = self.periods["Monthly"]
+        by_month = self.series("Monthly", 0, len(months) - 1, {}, by="Status").reset_index()
+        return {
+            "status_mapping": STATUS_MAPPING,
+            "month_labels": {i: label for i, label in enumerate(months)},
+            "week_labels": {i: label for i, label in enumerate(self.periods["Weekly"])},
+            **month_over_month(period_totals(by_month, "year_month", months))
+        }
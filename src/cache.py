@@ -0,0 +1,344 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import ExitStack
+from plotly.io.json import to_json_plotly
+from .filters import FilterSpec
+from .singleflight import SingleFlight, file_lock
+from .timing import stage
+
+# Counters kept for every cached callback
+CACHE_COUNTERS = ['hits', 'disk_hits', 'misses', 'coalesced', 'evictions', 'disk_evictions', 'expired']
+
+# Stable key of the arguments of a data callback
+def callback_key(filter_spec, *args):
+    """
+    Build the cache key of a data callback call from its canonical filter spec
+    and its other arguments (e.g. the structure of the figure in the browser).
+
+    Args:
+        filter_spec (dict): Serialized filter spec, None or {} without a selection.
+        *args: Other JSON-serializable arguments of the callback.
+
+    Returns:
+        str: Hex digest identifying the call.
+    """
+    spec_key = FilterSpec.from_dict(filter_spec).key if filter_spec else None
+    payload = json.dumps([spec_key, *args], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+class FigureCache:
+    """
+    Two-tier cache of the serialized outputs of the data callbacks.
+
+    Outputs (figures, partial updates, structures) are stored as their plotly JSON,
+    so a hit skips both the query and the figure building. A bounded in-memory LRU
+    sits in front of a size-capped directory shared by the workers. Entries of both
+    tiers expire after `ttl` seconds; on disk the least recently read files are
+    removed once the directory exceeds `max_disk_bytes`.
+
+    Entries are kept per version of the sales data, in a `data-<version>`
+    subdirectory on disk; switching to a new version drops those of the others.
+
+    A missed entry is computed once however many requests miss it together: the
+    threads of a process wait for the first one, the other workers for the one
+    holding the lock file of the entry, then read what it wrote.
+
+    Attributes:
+        version (str): Version of the sales data the entries belong to.
+        counters (dict): Per callback, number of hits, disk hits, misses, misses served
+            by the computation of another thread or worker (coalesced), evictions, disk
+            evictions and expired entries, counted in this process.
+    """
+
+    def __init__(self, directory='tmp', version=None, max_entries=256, max_disk_bytes=256 * 1024 ** 2,
+                 ttl=24 * 3600):
+        """
+        Args:
+            directory (str): Directory of the disk tier, None to keep entries in memory only.
+            version (str): Version of the sales data, see `data.dataset_version`.
+            max_entries (int): Number of entries kept in memory.
+            max_disk_bytes (int): Size limit of the disk tier.
+            ttl (float): Lifetime of an entry in seconds.
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.counters = defaultdict(lambda: dict.fromkeys(CACHE_COUNTERS, 0))
+        self._entries = OrderedDict()
+        self._in_flight = SingleFlight()
+        self._lock = threading.Lock()
+        # a process forked while another thread holds the lock (a background callback job) gets a free one
+        os.register_at_fork(after_in_child=self._reset_lock)
+        self._disk_bytes = 0
+        self.set_version(version)
+
+    def set_version(self, version):
+        """
+        Switch to a version of the sales data, evicting the entries of every other version.
+
+        Args:
+            version (str): Version of the sales data, None to not version the entries.
+        """
+        with self._lock:
+            self.version = version
+            self._entries.clear()
+        if not self.directory:
+            return
+
+        self.path = os.path.join(self.directory, f"data-{version}") if version else self.directory
+        os.makedirs(self.path, exist_ok=True)
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name.startswith('data-') and entry.path != self.path:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        disk_bytes = sum(size for _, _, size in self._disk_files())
+        with self._lock:
+            self._disk_bytes = disk_bytes
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def _count(self, name, counter, n=1):
+        with self._lock:
+            self.counters[name][counter] += n
+
+    def _path(self, name, key):
+        return os.path.join(self.path, f"{name}-{key}.json")
+
+    def _disk_files(self):
+        """
+        List the entries of the disk tier.
+
+        Returns:
+            list: (path, last read time, size) of every entry.
+        """
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # removed by another worker
+                    continue
+                files.append((entry.path, stat.st_atime, stat.st_size))
+        return files
+
+    def get(self, name, key):
+        """
+        Look up an entry, first in memory then on disk.
+
+        Args:
+            name (str): Name of the callback.
+            key (str): Key of the call, see `callback_key`.
+
+        Returns:
+            str: The serialized outputs, None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((name, key))
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end((name, key))
+                    self.counters[name]['hits'] += 1
+                    return value
+                del self._entries[(name, key)]
+                self.counters[name]['expired'] += 1
+
+        value = self._read_disk(name, key, now)
+        if value is None:
+            self._count(name, 'misses')
+            return None
+        self._count(name, 'disk_hits')
+        self._remember(name, key, value, now)
+        return value
+
+    def set(self, name, key, value, version=None):
+        """
+        Store an entry in both tiers.
+
+        Args:
+            name (str): Name of the callback.
+            key (str): Key of the call, see `callback_key`.
+            value (str): The serialized outputs.
+            version (str): Data version the value was computed for; the entry is
+                dropped if the cache switched to another version meanwhile.
+        """
+        if version is not None and version != self.version:
+            return
+        now = time.time()
+        self._remember(name, key, value, now)
+        self._write_disk(name, key, value, now)
+
+    def _remember(self, name, key, value, now):
+        with self._lock:
+            self._entries[(name, key)] = (now + self.ttl, value)
+            self._entries.move_to_end((name, key))
+            while len(self._entries) > self.max_entries:
+                (evicted_name, _), _ = self._entries.popitem(last=False)
+                self.counters[evicted_name]['evictions'] += 1
+
+    def _read_disk(self, name, key, now):
+        if not self.directory:
+            return None
+        path = self._path(name, key)
+        try:
+            # the modification time is the write time, the access time the last read
+            written = os.stat(path).st_mtime
+            if written + self.ttl <= now:
+                os.remove(path)
+                self._count(name, 'expired')
+                return None
+            with open(path) as f:
+                value = f.read()
+            os.utime(path, (now, written))
+            return value
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"Error reading the figure cache: {e}")
+            return None
+
+    def _write_disk(self, name, key, value, now):
+        if not self.directory:
+            return
+        path = self._path(name, key)
+        # written next to the entry and renamed, so other workers never read a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # the directory is gone if a worker already serving newer data evicted this version
+            os.makedirs(self.path, exist_ok=True)
+            with open(temp_path, 'w') as f:
+                f.write(value)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing the figure cache: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(value)
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._shrink_disk()
+
+    def _shrink_disk(self):
+        """
+        Remove the least recently read disk entries until the directory is 10% under its limit.
+        """
+        files = sorted(self._disk_files(), key=lambda file: file[1])
+        total = sum(size for _, _, size in files)
+        target = self.max_disk_bytes * 0.9
+        for path, _, size in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._count(os.path.basename(path).rsplit('-', 1)[0], 'disk_evictions')
+        with self._lock:
+            self._disk_bytes = total
+
+    def _compute(self, name, key, version, function, args):
+        """
+        Compute and store a missed entry, once across the workers sharing the disk tier.
+
+        The computing worker holds a lock file of the entry; the others wait for it
+        and read the entry it wrote.
+
+        Args:
+            name (str): Name of the callback.
+            key (str): Key of the call, see `callback_key`.
+            version (str): Data version at the time of the call.
+            function (callable): The data callback.
+            args (tuple): Arguments of the call.
+
+        Returns:
+            str: The serialized outputs.
+        """
+        with ExitStack() as stack:
+            if self.directory:
+                try:
+                    # the directory is gone if a worker already serving newer data evicted this version
+                    os.makedirs(self.path, exist_ok=True)
+                    stack.enter_context(file_lock(f"{self._path(name, key)}.lock"))
+                except OSError as e:
+                    print(f"Error locking the figure cache: {e}")
+                else:
+                    # computed by another worker while this one waited for the lock
+                    now = time.time()
+                    value = self._read_disk(name, key, now)
+                    if value is not None:
+                        self._count(name, 'coalesced')
+                        self._remember(name, key, value, now)
+                        return value
+
+            outputs = function(*args)
+            with stage("serialize"):
+                value = to_json_plotly(outputs)
+            with stage("cache"):
+                self.set(name, key, value, version)
+            return value
+
+    def memoize(self, name=None):
+        """
+        Cache the outputs of a data callback, keyed by `callback_key` of its arguments.
+
+        Apply it below `@callback`, so Dash registers the cached function.
+
+        Args:
+            name (str): Name of the callback in the counters, defaults to the function name.
+
+        Returns:
+            callable: Decorator.
+        """
+        def decorator(function):
+            cache_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args):
+                key = callback_key(*args)
+                version = self.version
+                with stage("cache"):
+                    value = self.get(cache_name, key)
+                if value is None:
+                    # concurrent misses of the same call compute it once
+                    value, shared = self._in_flight.run(
+                        (cache_name, key), lambda: self._compute(cache_name, key, version, function, args))
+                    if shared:
+                        self._count(cache_name, 'coalesced')
+                with stage("serialize"):
+                    outputs = json.loads(value)
+                return tuple(outputs) if isinstance(outputs, list) else outputs
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """
+        Counters and size of the cache in this process.
+
+        Returns:
+            dict: Data version, per callback counters and hit rate, plus the number of
+                entries in memory and the size of the disk tier.
+        """
+        with self._lock:
+            callbacks = {}
+            for name, counters in self.counters.items():
+                lookups = counters['hits'] + counters['disk_hits'] + counters['misses']
+                hit_rate = (counters['hits'] + counters['disk_hits']) / lookups if lookups else None
+                callbacks[name] = {**counters, 'hit_rate': hit_rate}
+            return {
+                'version': self.version,
+                'callbacks': callbacks,
+                'memory_entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_bytes': self._disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                'ttl': self.ttl
+            }
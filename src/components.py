@@ -1,8 +1,10 @@
 import dash_bootstrap_components as dbc
 from dash import html, dcc
-from git import Repo
-from datetime import datetime
 import json
+import os
+
+# Build-time metadata written by utils/stamp_build.py
+BUILD_INFO_PATH = os.path.join(os.path.dirname(__file__), 'build_info.json')
 
 # Function to format numeric values
 def format_large_num(value):
@@ -25,19 +27,17 @@ def format_large_num(value):
 # Function to get the latest commit date on the main branch
 def get_latest_commit_date():
     """
-    Get the date of the latest commit on the main branch in the repository.
+    Get the date of the latest commit on the main branch, as stamped at build time
+    by `utils/stamp_build.py`. Git is never run at runtime.
     
     Returns:
-        str: Latest commit date in "Month Day, Year" format.
+        str: Latest commit date in "Month Day, Year" format, "Unknown Date" without the stamp.
     """
     try:
-        repo = Repo(".")
-        main_branch = repo.branches['main']
-        latest_commit = main_branch.commit
-        commit_date = datetime.fromtimestamp(latest_commit.committed_date)
-        return commit_date.strftime("%B %d, %Y")
+        with open(BUILD_INFO_PATH) as f:
+            return json.load(f)["commit_date"]
     except Exception as e:
-        print(f"Error fetching commit date: {e}")
+        print(f"Error fetching commit date: {BUILD_INFO_PATH}: {e}")
         return "Unknown Date"
 
 def format_indian_rupees(amount):
@@ -345,14 +345,14 @@ def create_metrics():
             "width": "94%", "text-align": "center", "background-color": "#f8f9fa", "border-radius": "10px"}), width=4)
     ], id='metrics', justify="center")
 
-def create_map_graph():
+def create_map_graph(base_map):
     return dbc.Card([
         dbc.CardHeader('Map of India'),
         dbc.CardBody([
             html.Div(
                 dcc.Graph(
                     id='map',
-                    figure={},
+                    figure=base_map,
                     config={'displayModeBar': True}
                 ),
                 style={'cursor': 'pointer'}
@@ -363,25 +363,29 @@ def create_map_graph():
 def create_state_summary_graph():
     return dbc.Card([
         dbc.CardHeader('Top States by Sales'),
-        dbc.CardBody(dcc.Graph(id='state_summary', figure={}))
+        dbc.CardBody([
+            dcc.Graph(id='state_summary', figure={}),
+            # structure of the figure in the browser, to send only data updates
+            dcc.Store(id='state-summary-structure')
+        ])
     ], style={"margin-top": "5px"})
 
 def create_sales_graph():
     return dbc.Card([
         dbc.CardHeader(id='sales-chart-header', children='Monthly Sales'),
-        dbc.CardBody(dcc.Graph(id='sales', figure={})), 
+        dbc.CardBody([dcc.Graph(id='sales', figure={}), dcc.Store(id='sales-structure')]), 
     ], style={"margin-top": "5px"}) 
 
 def create_product_graph():
     return dbc.Card([
         dbc.CardHeader('Sales Breakdown'),
-        dbc.CardBody(dcc.Graph(id='product', figure={}))
+        dbc.CardBody([dcc.Graph(id='product', figure={}), dcc.Store(id='product-structure')])
     ], style={"margin-top": "5px"}) 
 
-def create_visuals():
+def create_visuals(base_map):
     return dbc.Row([
                 dbc.Row([
-                    dbc.Col([create_map_graph()], className="chart_column"),
+                    dbc.Col([create_map_graph(base_map)], className="chart_column"),
                     dbc.Col([create_state_summary_graph()], className="chart_column")
                     ]),
                 dbc.Row([
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+from .filters import build_filter_index, filter_mask
+
+# Non-time dimensions and measures held by the cube
+CUBE_DIMENSIONS = ['Status', 'Fulfilment', 'Category', 'state', 'is_promotion']
+CUBE_MEASURES = ['Amount', 'Qty', 'order_count']
+
+class DataCube:
+    """
+    Pre-aggregated sales cube with cumulative sums along the time axis.
+
+    Every distinct combination of the dimensions is a cell. For each measure the
+    cube holds a (cells x periods + 1) matrix of prefix sums over the periods, so
+    the total of any contiguous period range is the difference of two columns and
+    costs one operation per cell, whatever the number of underlying rows.
+
+    Attributes:
+        time_column (str): Name of the time column the cube is laid out on.
+        periods (list): Period labels, in slider order.
+        dimensions (list): Dimension columns of the cells.
+        cells (pd.DataFrame): Dimension values of every cell.
+        index (dict): Filter index over the cells.
+        prefix (dict): Mapping of measure to its prefix sum matrix.
+    """
+
+    def __init__(self, df, time_column, periods, dimensions=CUBE_DIMENSIONS, measures=CUBE_MEASURES):
+        """
+        Build the cube from the sales data.
+
+        Args:
+            df (pd.DataFrame): Sales data.
+            time_column (str): Time column to lay the cube out on, e.g. "year_month".
+            periods (list): Period labels in slider order. Rows of other periods are ignored.
+            dimensions (list): Dimension columns of the cells.
+            measures (list): Measure columns to sum.
+        """
+        self.time_column = time_column
+        self.periods = list(periods)
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+
+        # dictionary-encode the cells and the periods
+        grouper = df.groupby(self.dimensions, sort=True, observed=True, dropna=False)
+        self.cells = grouper.size().index.to_frame(index=False)
+        totals = self._period_totals(df, grouper.ngroup().to_numpy(), len(self.cells))
+        self._set_totals(totals)
+
+    def _period_totals(self, df, cell_ids, n_cells):
+        """
+        Sum the measures of rows per cell and period.
+
+        Args:
+            df (pd.DataFrame): Sales data.
+            cell_ids (np.ndarray): Cell of every row.
+            n_cells (int): Number of cells.
+
+        Returns:
+            dict: Mapping of measure to its (cells x periods) matrix of totals.
+        """
+        period_ids = pd.Categorical(df[self.time_column], categories=self.periods).codes
+        n_periods = len(self.periods)
+        known = period_ids >= 0
+        flat_ids = cell_ids[known] * n_periods + period_ids[known]
+
+        totals = {}
+        for measure in self.measures:
+            values = df[measure].to_numpy()[known]
+            measure_totals = np.bincount(flat_ids, weights=values, minlength=n_cells * n_periods)
+            measure_totals = measure_totals.reshape(n_cells, n_periods)
+            if not np.issubdtype(values.dtype, np.floating):
+                measure_totals = measure_totals.round().astype(np.int64)
+            totals[measure] = measure_totals
+        return totals
+
+    def _set_totals(self, totals):
+        """
+        Set the prefix sums and the filter index of the cells from their period totals.
+
+        Args:
+            totals (dict): Mapping of measure to its (cells x periods) matrix of totals.
+        """
+        self.prefix = {}
+        for measure, measure_totals in totals.items():
+            n_cells, n_periods = measure_totals.shape
+            prefix = np.zeros((n_cells, n_periods + 1), dtype=measure_totals.dtype)
+            np.cumsum(measure_totals, axis=1, out=prefix[:, 1:])
+            self.prefix[measure] = prefix
+
+        self.index = build_filter_index(self.cells, self.dimensions)
+
+    def extended(self, new_rows, periods):
+        """
+        Build the cube of the sales data with rows appended, from this cube's
+        totals and the new rows only.
+
+        New cells are added after the existing ones and the period axis is laid
+        out again on `periods`, which must contain the current periods. This cube
+        is left unchanged, so it can keep serving until the new one replaces it.
+
+        Args:
+            new_rows (pd.DataFrame): Rows appended to the sales data.
+            periods (list): Period labels in slider order, including new periods.
+
+        Returns:
+            DataCube: The extended cube.
+        """
+        cube = DataCube.__new__(DataCube)
+        cube.time_column = self.time_column
+        cube.periods = list(periods)
+        cube.dimensions = self.dimensions
+        cube.measures = self.measures
+
+        # cells of the new rows, existing ones keep their position and new ones follow in order of appearance
+        cells = pd.MultiIndex.from_frame(self.cells)
+        row_cells = pd.MultiIndex.from_frame(new_rows[self.dimensions])
+        cell_ids = cells.get_indexer(row_cells)
+        unknown = cell_ids < 0
+        new_cells = row_cells[unknown].unique()
+        cell_ids[unknown] = len(cells) + new_cells.get_indexer(row_cells[unknown])
+        cube.cells = pd.concat([self.cells.astype(object), new_cells.to_frame(index=False).astype(object)],
+                               ignore_index=True)
+
+        # current totals moved to their period in the new layout, plus the new rows
+        period_position = {period: i for i, period in enumerate(cube.periods)}
+        period_positions = [period_position[period] for period in self.periods]
+        new_totals = cube._period_totals(new_rows, cell_ids, len(cube.cells))
+        totals = {}
+        for measure, prefix in self.prefix.items():
+            measure_totals = new_totals[measure].astype(prefix.dtype)
+            measure_totals[:len(self.cells), period_positions] += np.diff(prefix, axis=1)
+            totals[measure] = measure_totals
+        cube._set_totals(totals)
+        return cube
+
+    def range_values(self, start, end, conditions=None):
+        """
+        Per-cell totals of every measure over a period range.
+
+        Args:
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            conditions (dict): Filter conditions on the cube dimensions.
+
+        Returns:
+            tuple: Boolean mask of the selected cells and a mapping of measure
+                to the totals of those cells.
+        """
+        mask = filter_mask(self.index, conditions or {})
+        values = {measure: prefix[mask, end + 1] - prefix[mask, start]
+                  for measure, prefix in self.prefix.items()}
+        return mask, values
+
+    def totals(self, start, end, conditions=None):
+        """
+        Grand totals of every measure over a period range.
+
+        Args:
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            conditions (dict): Filter conditions on the cube dimensions.
+
+        Returns:
+            dict: Mapping of measure to its total.
+        """
+        _, values = self.range_values(start, end, conditions)
+        return {measure: cell_values.sum().item() for measure, cell_values in values.items()}
+
+    def rollup(self, start, end, by, conditions=None):
+        """
+        Totals of every measure over a period range, grouped by one dimension.
+
+        Args:
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            by (str): Dimension to group by, e.g. "state".
+            conditions (dict): Filter conditions on the cube dimensions.
+
+        Returns:
+            pd.DataFrame: One row per value of the dimension (sorted), one column per measure.
+        """
+        mask, values = self.range_values(start, end, conditions)
+        column_index = self.index["columns"][by]
+        codes = column_index["codes"][mask]
+        n_values = len(column_index["values"])
+
+        grouped = {}
+        for measure, cell_values in values.items():
+            sums = np.bincount(codes, weights=cell_values, minlength=n_values)
+            grouped[measure] = sums if np.issubdtype(cell_values.dtype, np.floating) else sums.round().astype(np.int64)
+        return pd.DataFrame(grouped, index=pd.Index(column_index["values"], name=by))
+
+    def series(self, start, end, conditions=None, by=None):
+        """
+        Totals of every measure for each period of a range.
+
+        Args:
+            start (int): Index of the first period.
+            end (int): Index of the last period, inclusive.
+            conditions (dict): Filter conditions on the cube dimensions.
+            by (str): Optional dimension to also group by, e.g. "Status".
+
+        Returns:
+            pd.DataFrame: One row per period (labelled by the time column), or per
+                period and value of `by`, with one column per measure.
+        """
+        mask = filter_mask(self.index, conditions or {})
+        periods = self.periods[start:end + 1]
+        if by is None:
+            series = {measure: np.diff(prefix[mask, start:end + 2].sum(axis=0))
+                      for measure, prefix in self.prefix.items()}
+            return pd.DataFrame(series, index=pd.Index(periods, name=self.time_column))
+
+        column_index = self.index["columns"][by]
+        codes = column_index["codes"][mask]
+        values = column_index["values"]
+        series = {}
+        for measure, prefix in self.prefix.items():
+            grouped = np.zeros((len(values), len(periods)), dtype=prefix.dtype)
+            np.add.at(grouped, codes, np.diff(prefix[mask, start:end + 2], axis=1))
+            # period-major order, matching the index below
+            series[measure] = grouped.T.ravel()
+        index = pd.MultiIndex.from_product([periods, values], names=[self.time_column, by])
+        return pd.DataFrame(series, index=index)
@@ -1,82 +1,276 @@
+import hashlib
+import json
+import os
+import numpy as np
 import pandas as pd
-import geopandas as gpd
+from .cube import DataCube
+from .kpis import period_totals
+
+# Processed sales data read by the dashboard, a parquet file or a dataset partitioned by month
+DATA_PATH = os.environ.get('DASHBOARD_DATA', 'data/processed/amazon_in_sales.parquet')
+
+# Column the partitioned dataset is split on, see utils/clean_raw_data.py
+PARTITION_COLUMN = 'year_month'
+
+# Declared in-memory schema of the sales data
+#   period:   ordered categorical of the time labels, its codes are the slider index
+#   category: dictionary-encoded dimension
+#   integer:  integer measure, downcast to the narrowest integer type holding its values
+#   other:    numpy dtype; Amount stays float64 as float32 would round large rupee sums
+SALES_SCHEMA = {
+    'year_month': 'period',
+    'year_week': 'period',
+    'Status': 'category',
+    'Fulfilment': 'category',
+    'Category': 'category',
+    'state': 'category',
+    'is_promotion': 'bool',
+    'Qty': 'integer',
+    'order_count': 'integer',
+    'Amount': 'float64'
+}
+
+# Order statuses grouped as shown in the status filter
+STATUS_MAPPING = {
+    'Cancelled': ['Cancelled'],
+    'Pending': ['Pending', 'Pending - Waiting for Pick Up', 'Shipping'],
+    'Shipped': ['Shipped', 'Shipped - Damaged', 'Shipped - Delivered to Buyer',
+        'Shipped - Lost in Transit', 'Shipped - Out for Delivery',
+        'Shipped - Picked Up', 'Shipped - Rejected by Buyer',
+        'Shipped - Returned to Seller', 'Shipped - Returning to Seller'],
+}
+
+# Convert the sales data to the declared schema
+def apply_schema(df, schema=SALES_SCHEMA):
+    """
+    Convert the columns of the sales data to the compact types of the schema.
+
+    Args:
+        df (pd.DataFrame): Sales data.
+        schema (dict): Mapping of column name to its kind or dtype.
+
+    Returns:
+        pd.DataFrame: Sales data with only the schema columns, converted.
+    """
+    df = df[list(schema)].copy()
+    for column, kind in schema.items():
+        if kind == 'period':
+            # the labels ("2022-04", "2022-03-28/2022-04-03") sort chronologically
+            df[column] = pd.Categorical(df[column], categories=sorted(df[column].unique()), ordered=True)
+        elif kind == 'category':
+            df[column] = df[column].astype('category')
+        elif kind == 'integer':
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+        else:
+            df[column] = df[column].astype(kind)
+    return df
+
+# Append rows to the sales data
+def append_rows(df, new_rows, schema=SALES_SCHEMA):
+    """
+    Append rows to the sales data, keeping the compact types of the schema.
+
+    The categories of the categorical columns are extended with the new values,
+    still sorted, so the result matches loading all rows with `apply_schema`.
+
+    Args:
+        df (pd.DataFrame): Sales data in the schema.
+        new_rows (pd.DataFrame): Rows to append, with at least the schema columns.
+        schema (dict): Mapping of column name to its kind or dtype.
+
+    Returns:
+        pd.DataFrame: Sales data with the new rows at the end.
+    """
+    old_columns, new_columns = {}, {}
+    for column, kind in schema.items():
+        if kind in ('period', 'category'):
+            categories = sorted(set(df[column].cat.categories).union(new_rows[column].dropna().unique()))
+            old_columns[column] = df[column].cat.set_categories(categories)
+            new_columns[column] = pd.Categorical(new_rows[column], categories=categories, ordered=kind == 'period')
+        else:
+            old_columns[column] = df[column]
+            new_columns[column] = new_rows[column].to_numpy()
+    combined = pd.concat([pd.DataFrame(old_columns), pd.DataFrame(new_columns)], ignore_index=True)
+    for column, kind in schema.items():
+        if kind == 'integer':
+            combined[column] = pd.to_numeric(combined[column], downcast='integer')
+        elif kind not in ('period', 'category'):
+            combined[column] = combined[column].astype(kind)
+    return combined
+
+# Memory used by the sales data
+def memory_report(df, preprocessed_data=None):
+    """
+    Report the memory used by each column of the sales data and, if given, by
+    the cubes built from it.
+
+    Args:
+        df (pd.DataFrame): Sales data.
+        preprocessed_data (dict): Output of `preprocess_data` for the sales data.
+
+    Returns:
+        pd.DataFrame: dtype and bytes of every column and of every cube, plus a total row.
+    """
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(deep=True, index=False)
+    })
+    if preprocessed_data is not None:
+        for granularity, cube in preprocessed_data['cubes'].items():
+            report.loc[f'cube {granularity}'] = ['', _nbytes(vars(cube))]
+    report.loc['total'] = ['', report['bytes'].sum()]
+    return report
+
+def _nbytes(value):
+    """
+    Bytes of the arrays and frames held by a nested structure of dicts and lists.
+
+    Args:
+        value: Array, frame, or dict or list of them.
+
+    Returns:
+        int: Bytes of the arrays and frames, other values are not counted.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=False).sum())
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+# Version of the sales data
+def dataset_version(url):
+    """
+    Identify the version of the sales data from the metadata of its files.
+
+    Cached figures, query results and shared snapshots are keyed by this version,
+    so replacing the file invalidates them, while redeploying the same file keeps them.
+    Only the footer of a parquet file is read: its schema, row group sizes and
+    column statistics change with the content. Other files (e.g. CSV batches) are
+    identified by their size and modification time.
+
+    Args:
+        url (str): File path to the parquet file, or to the directory of a partitioned dataset.
+
+    Returns:
+        str: Short hex digest of the metadata, of every file and its path in a dataset.
+    """
+    digest = hashlib.sha1()
+    if os.path.isdir(url):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(url)
+                       for name in names if not name.startswith('.'))
+    else:
+        paths = [url]
+    for path in paths:
+        if path != url:
+            digest.update(os.path.relpath(path, url).encode())
+        digest.update(_file_signature(path))
+    return digest.hexdigest()[:12]
+
+def _file_signature(path):
+    """
+    Size and parquet footer of a file, or its size and modification time if it is not parquet.
+
+    Args:
+        path (str): File path.
+
+    Returns:
+        bytes: The signature.
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        # a parquet file ends with its footer, the footer length and the magic bytes
+        if stat.st_size >= 12:
+            f.seek(-8, os.SEEK_END)
+            tail = f.read(8)
+            footer_length = int.from_bytes(tail[:4], 'little')
+            if tail[4:] == b'PAR1' and footer_length <= stat.st_size - 12:
+                f.seek(-8 - footer_length, os.SEEK_END)
+                return str(stat.st_size).encode() + f.read(footer_length)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
 
 # Import sales data for dashboard
-def import_data(url):
+def import_data(url, schema=SALES_SCHEMA, filters=None):
     """
-    Import and preprocess sales data from a parquet file.
+    Import sales data from a parquet file into the compact in-memory schema.
+
+    Only the schema columns are read. With filters, the partitions and row groups
+    whose statistics exclude every match are skipped without being read.
 
     Args:
-        url (str): URL or file path to the parquet file.
+        url (str): URL or file path to the parquet file, or to a partitioned dataset.
+        schema (dict): Mapping of column name to its kind or dtype.
+        filters (list): Parquet filters, e.g. [('year_month', '>=', '2022-05')].
 
     Returns:
-        pd.DataFrame: Preprocessed sales data.
+        pd.DataFrame: Sales data.
     """
-    df = pd.read_parquet(url)
-    # add a filterable date_value for the 1st of the month
-    df['date_value'] = pd.to_datetime(df['year_month'] + '-01')
+    df = apply_schema(pd.read_parquet(url, columns=list(schema), filters=filters), schema)
+    report = memory_report(df)
+    print(f"Loaded {len(df):,} sales rows using {report.loc['total', 'bytes'] / 1024 ** 2:.2f} MB")
     return df
 
 # Import geojson file for India
 def import_geojson(url):
     """
-    Import geojson data for India.
+    Import the simplified India state boundaries bundled with the dashboard.
+
+    The file is produced offline by `utils/build_india_geometry.py` and loaded as
+    plain JSON, so the returned dict can be passed to plotly as is.
 
     Args:
-        url (str): URL or file path to the geojson file.
+        url (str): File path to the bundled geojson file.
 
     Returns:
-        gpd.GeoDataFrame: GeoDataFrame containing geojson data for India.
-    """
-    india = gpd.read_file(url).query("iso_a2 == 'IN'")
-    india.rename(columns={'name': 'state'}, inplace=True)
+        dict: GeoJSON FeatureCollection of the Indian states, with the state name
+            in the "state" property.
 
-    return india
+    Raises:
+        FileNotFoundError: If the file has not been built.
+    """
+    if not os.path.exists(url):
+        raise FileNotFoundError(f"{url} not found, build the state boundaries with "
+                                "`python utils/build_india_geometry.py` (downloads Natural Earth)")
+    with open(url) as f:
+        return json.load(f)
 
-# Preprocess data
-def preprocess_data(df):
+# Sorted period labels of the sales data
+def period_labels(df):
     """
-    Preprocess sales data to compute various metrics and mappings.
+    Get the month and week labels of the sales data in chronological order.
 
     Args:
-        df (pd.DataFrame): Preprocessed sales data.
+        df (pd.DataFrame): Sales data.
 
     Returns:
-        dict: Dictionary containing computed metrics and mappings.
+        tuple: Sorted month labels and sorted week labels.
     """
-    status_mapping = {
-        'Cancelled': ['Cancelled'],
-        'Pending': ['Pending', 'Pending - Waiting for Pick Up', 'Shipping'],
-        'Shipped': ['Shipped', 'Shipped - Damaged', 'Shipped - Delivered to Buyer',
-            'Shipped - Lost in Transit', 'Shipped - Out for Delivery',
-            'Shipped - Picked Up', 'Shipped - Rejected by Buyer',
-            'Shipped - Returned to Seller', 'Shipped - Returning to Seller'],
-    }
-
     # Extract all unique year-month values from the full dataset
-    all_months = df["year_month"].unique()
-    all_months_sorted = sorted(all_months)  # Ensure months are sorted
-
-    # Create a mapping of months to index positions for the slider
-    month_labels = {i: label for i, label in enumerate(all_months_sorted)}
+    all_months_sorted = sorted(df["year_month"].unique())
 
-    # Create a mapping of weeks
     weeks = df['year_week'].unique()
     sorted_weeks = sorted(weeks, key=lambda x: pd.to_datetime(x.split('/')[0]))
-    week_labels = {i: week for i, week in enumerate(sorted_weeks)}
+    return all_months_sorted, sorted_weeks
 
-    # Filter only last 2 months
-    df_month_values = (
-        df.groupby('year_month').agg({'Amount': 'sum', 'Qty': 'sum'})
-        .sort_index()
-    )[-2:]
+# Month-over-month KPIs
+def month_over_month(month_totals):
+    """
+    Compute the KPIs of the last month and their change from the month before.
 
-    # Create list of the last 2 months and filter for metric
-    last2_months = df_month_values.index.to_list()
-    df_metric = df[df["year_month"].isin(last2_months)]
+    Args:
+        month_totals (pd.DataFrame): Totals per month from `kpis.period_totals`.
+
+    Returns:
+        dict: Current revenue, quantity and completion rate and their month-over-month changes.
+    """
+    # Only the last 2 months
+    last_months = month_totals[-2:]
 
     # Compute Revenue Change over the last 2 months
-    revenue_mom = df_month_values[['Amount']]
+    revenue_mom = last_months[['Amount']]
 
     # Ensure we have at least two months of data before computing the percentage change
     if len(revenue_mom) > 1:
@@ -85,7 +279,7 @@ def preprocess_data(df):
         revenue_mom_change = 0  # Default to 0% change if not enough data
 
     # Compute Quantity Sold Change
-    qty_mom = df_month_values[['Qty']]
+    qty_mom = last_months[['Qty']]
 
     # Ensure we have at least two months of data before computing the percentage change
     if len(qty_mom) > 1:
@@ -93,18 +287,8 @@ def preprocess_data(df):
     else:
         quantity_mom_change = 0  # Default to 0% change if not enough data
 
-    total_revenue_current = revenue_mom.iloc[-1].item()
-    total_quantity_current = qty_mom.iloc[-1].item()
-
     # Compute Completed Orders Percentage
-    completed_status = ["Shipped", "Shipped - Delivered to Buyer", "Shipped - Picked Up", "Shipped - Out for Delivery"]
-    df.loc[:, "order_status_category"] = df["Status"].where(df["Status"].isin(completed_status), "Uncompleted")
-
-    monthly_counts = df.groupby("year_month")["order_status_category"].count()
-    completed_counts = df[df["order_status_category"] == "Completed"].groupby("year_month")["order_status_category"].count()
-
-    # Get the completion rate, ensure values sorted by month
-    completion_rate = (completed_counts / monthly_counts).sort_index() * 100
+    completion_rate = month_totals["completion_rate"]
     completion_rate_current = completion_rate.iloc[-1]
 
     # Ensure 2+ months worth of data exists before accessing
@@ -115,13 +299,46 @@ def preprocess_data(df):
         completion_rate_mom_change = 0  # Default to 0% if only one month of data
 
     return {
-        "status_mapping": status_mapping,
-        "month_labels": month_labels,
-        "week_labels": week_labels,
-        "total_revenue_current": total_revenue_current,
+        "total_revenue_current": revenue_mom.iloc[-1].item(),
         "revenue_mom_change": revenue_mom_change,
-        "total_quantity_current": total_quantity_current,
+        "total_quantity_current": qty_mom.iloc[-1].item(),
         "quantity_mom_change": quantity_mom_change,
         "completion_rate_current": completion_rate_current,
         "completion_rate_mom_change": completion_rate_mom_change
+    }
+
+# Preprocess data
+def preprocess_data(df):
+    """
+    Preprocess sales data to compute various metrics and mappings.
+
+    Args:
+        df (pd.DataFrame): Preprocessed sales data.
+
+    Returns:
+        dict: Dictionary containing computed metrics and mappings.
+    """
+    status_mapping = STATUS_MAPPING
+
+    # Sorted month and week labels of the sliders
+    all_months_sorted, sorted_weeks = period_labels(df)
+
+    # Create a mapping of months to index positions for the slider
+    month_labels = {i: label for i, label in enumerate(all_months_sorted)}
+
+    # Create a mapping of weeks
+    week_labels = {i: week for i, week in enumerate(sorted_weeks)}
+
+    # Revenue, quantity and completion rate of every month, weighted by the number of orders
+    month_totals = period_totals(df, "year_month", all_months_sorted)
+
+    return {
+        "status_mapping": status_mapping,
+        "month_labels": month_labels,
+        "week_labels": week_labels,
+        **month_over_month(month_totals),
+        "cubes": {
+            "Monthly": DataCube(df, "year_month", all_months_sorted),
+            "Weekly": DataCube(df, "year_week", sorted_weeks)
+        }
     }
\ No newline at end of file
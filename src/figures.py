@@ -0,0 +1,316 @@
+import os
+import threading
+import plotly.graph_objects as go
+from plotly.colors import sequential
+from dash import Patch
+from .components import format_indian_rupees
+from .timing import stage
+
+# Building a figure reads the shared default template, which is not thread-safe,
+# so full figures of concurrent requests or of the cache warmup are built in turn
+_build_lock = threading.Lock()
+
+# A process forked while another thread builds a figure (a background callback job) gets a free lock
+def _reset_build_lock():
+    global _build_lock
+    _build_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_build_lock)
+
+# Create the map figure holding the state geometry
+def create_base_map(india, states):
+    """
+    Create the choropleth of India with its geometry and fixed layout.
+
+    The figure is placed in the layout, so the geometry is sent to the browser once
+    per session. Filter changes only patch its values with `patch_map`.
+
+    Args:
+        india (dict): GeoJSON FeatureCollection of the Indian states.
+        states (list): States shown on the map, in the order of the patched values.
+
+    Returns:
+        plotly.graph_objects.Figure: Map figure with all values at 0.
+    """
+    # graph_objects directly, so plotly express is not imported at startup
+    fig = go.Figure(go.Choropleth(
+        geojson=india,
+        locations=states,
+        featureidkey="properties.state",
+        z=[0.0] * len(states),
+        coloraxis='coloraxis',
+        geo='geo',
+        name='',
+        hovertext=states,
+        customdata=[[state] for state in states],
+        # Custom hover template, the hover text is patched with the values
+        hovertemplate="%{hovertext}",
+        marker_line_width=1,
+        marker_line_color='black'
+    ))
+
+    fig.update_geos(
+        domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]),
+        fitbounds="locations",
+        visible=False,
+        projection_type="mercator",
+        projection_scale=6,  # Adjust this value to zoom in or out
+        center={"lat": 20.5937, "lon": 78.9629}  # Center the map on India
+    )
+    fig.update_layout(
+        modebar=dict(remove=['select', 'lasso2d']),
+        margin={"r":0,"t":20,"l":0,"b":0},
+        legend_tracegroupgap=0,
+        dragmode=False,
+        clickmode='event',
+        hoverdistance=5,
+        coloraxis_colorbar=dict(
+            x=-0.1,
+            y=0.5,
+            title="Sales",
+            ticks="outside"
+        ),
+        # set a color scale to be shared, its range is patched with the values
+        coloraxis=dict(colorscale="Bluyl", cmin=0, cmax=1)
+    )
+    return fig
+
+# Patch the values of the map, leaving its geometry in the browser
+def patch_map(state_sales):
+    """
+    Build a partial update of the map with new values and selected state outline.
+
+    Args:
+        state_sales (pd.DataFrame): State, Amount and selected columns, in the order of
+            the base map states; None if there is no data for the filters.
+
+    Returns:
+        dash.Patch: Partial update of the map figure.
+    """
+    patch = Patch()
+    if state_sales is None:
+        patch['data'][0]['visible'] = False
+        patch['layout']['annotations'] = [dict(
+            text="No sales data available for the selected state.",
+            x=0.5, y=0.5,
+            xref="paper", yref="paper",
+            showarrow=False,
+            font=dict(size=16)
+        )]
+        return patch
+
+    patch['data'][0]['visible'] = True
+    patch['layout']['annotations'] = []
+    patch['data'][0]['z'] = state_sales['Amount'].tolist()
+    patch['data'][0]['hovertext'] = [
+        f"{state}<br>Amount: {format_indian_rupees(round(amount))}"
+        for state, amount in zip(state_sales['State'], state_sales['Amount'])
+    ]
+
+    # Highlight the selected state
+    patch['data'][0]['marker']['line']['width'] = state_sales['selected'].map({True: 3, False: 1}).tolist()
+
+    patch['layout']['coloraxis']['cmin'] = float(state_sales["Amount"].min())
+    patch['layout']['coloraxis']['cmax'] = float(state_sales["Amount"].max())
+    return patch
+
+# Pick a partial update when the browser already shows a figure of the same structure
+def update_figure(current_structure, structure, build_figure, build_patch):
+    """
+    Return a data-only partial update if the figure in the browser has the same
+    structure, otherwise fall back to building the full figure.
+
+    Args:
+        current_structure (str): Structure of the figure in the browser, None before the first render.
+        structure (str): Structure of the figure to show, e.g. "Monthly", "Weekly", "bars" or "empty".
+        build_figure (callable): Builds the full figure.
+        build_patch (callable): Builds the partial update.
+
+    Returns:
+        tuple: The figure or dash.Patch, and the structure now shown in the browser.
+    """
+    with stage("figure"):
+        if current_structure == structure:
+            return build_patch(), structure
+        with _build_lock:
+            return build_figure(), structure
+
+# Create the figure shown when there is no data
+def create_empty_figure(message):
+    """
+    Create a blank figure with a message.
+
+    Args:
+        message (str): Message shown in the middle of the figure.
+
+    Returns:
+        plotly.graph_objects.Figure: Empty figure.
+    """
+    fig = go.Figure()
+    fig.add_annotation(
+        text=message,
+        x=0.5, y=0.5,
+        xref="paper", yref="paper",
+        showarrow=False,
+        font=dict(size=16)
+    )
+    fig.update_layout(
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        template="plotly_white"
+    )
+    return fig
+
+# Create the bar chart of the top states
+def create_state_summary_figure(summary_selection, ordered_states):
+    """
+    Create the bar chart of sales of the top states.
+
+    Args:
+        summary_selection (pd.DataFrame): State, Amount, Sales Amount and Percentage columns.
+        ordered_states (list): States in display order, top first.
+
+    Returns:
+        plotly.graph_objects.Figure: State summary bar chart.
+    """
+    import plotly.express as px  # slow to import, deferred until the first full figure
+    summary_bar = px.bar(summary_selection, x = 'Amount', 
+                         y = 'State',  
+                         orientation='h',
+                         hover_data={'Sales Amount': True, 
+                                     'Amount': False,
+                                     'Percentage': ':.1%'}, 
+                         #color_continuous_scale=px.colors.sequential.Bluyl                        
+                         )
+
+    #set color to first color in the map color scale
+    summary_bar.update_traces(marker_color=sequential.Bluyl[-1]) 
+    #                          marker_line_color='rgb(8,48,107)', marker_line_width=1.5, opacity=0.6)
+    # y-axis since state names are specified
+    summary_bar.update_layout(xaxis_title = 'Sales Amount', 
+                            yaxis_title = None)
+    # sort by totals
+    summary_bar.update_yaxes(categoryorder = 'array', 
+                            categoryarray = ordered_states[::-1])
+    # hide legend and color axis
+    summary_bar.update_layout(showlegend = False, 
+                              margin={"r":0,"t":30,"l":0,"b":0})
+    summary_bar.update_coloraxes(showscale=False)
+    return summary_bar
+
+# Patch the data of the top states bar chart
+def patch_state_summary(summary_selection, ordered_states):
+    """
+    Build a partial update of the state summary bar chart.
+
+    Args:
+        summary_selection (pd.DataFrame): State, Amount, Sales Amount and Percentage columns.
+        ordered_states (list): States in display order, top first.
+
+    Returns:
+        dash.Patch: Partial update of the bars, hover data and category order.
+    """
+    patch = Patch()
+    patch['data'][0]['x'] = summary_selection['Amount'].tolist()
+    patch['data'][0]['y'] = summary_selection['State'].tolist()
+    # same column order as the hover_data of the full figure
+    patch['data'][0]['customdata'] = summary_selection[['Sales Amount', 'Percentage']].values.tolist()
+    patch['layout']['yaxis']['categoryarray'] = ordered_states[::-1]
+    return patch
+
+# Create the sales line chart
+def create_sales_figure(selection, x_column, x_label):
+    """
+    Create the line chart of sales over time.
+
+    Args:
+        selection (pd.DataFrame): Amount and the time column to plot.
+        x_column (str): Name of the time column.
+        x_label (str): Label of the time axis.
+
+    Returns:
+        plotly.graph_objects.Figure: Sales chart figure.
+    """
+    import plotly.express as px  # slow to import, deferred until the first full figure
+    sales = px.line(
+        selection,
+        x=x_column,
+        y='Amount',
+        labels={x_column: x_label, 'Amount': 'Total Sales'},
+        line_shape='linear'
+    )
+
+    # Disable pan and zoom
+    sales.update_layout(
+        xaxis=dict(fixedrange=True),
+        yaxis=dict(fixedrange=True),
+        margin={"r":0,"t":30,"l":0,"b":0},
+    )
+    return sales
+
+# Patch the data of the sales line chart
+def patch_sales(selection, x_column):
+    """
+    Build a partial update of the sales line chart.
+
+    Args:
+        selection (pd.DataFrame): Amount and the time column to plot.
+        x_column (str): Name of the time column.
+
+    Returns:
+        dash.Patch: Partial update of the line.
+    """
+    patch = Patch()
+    patch['data'][0]['x'] = selection[x_column].dt.strftime('%Y-%m-%d').tolist()
+    patch['data'][0]['y'] = selection['Amount'].tolist()
+    return patch
+
+# Create the product category bar chart
+def create_product_figure(selection, ordered_categories):
+    """
+    Create the bar chart of sales by product category.
+
+    Args:
+        selection (pd.DataFrame): Category, Amount and Percentage columns.
+        ordered_categories (list): Categories in display order, top first.
+
+    Returns:
+        plotly.graph_objects.Figure: Product chart figure.
+    """
+    import plotly.express as px  # slow to import, deferred until the first full figure
+    product = px.bar(selection, x = 'Amount', 
+                     y = 'Category', 
+                     orientation='h',
+                     hover_data=['Amount', 'Percentage'],
+                     #height = 'auto'
+                     )
+    product.update_traces(marker_color=sequential.Bluyl[-1]) 
+    # hide legend and y-axis since Category names are specified
+    product.update_layout(showlegend = False)
+    product.update_layout(xaxis_title = 'Sales Amount', 
+                          yaxis_title = None,
+                          margin={"r":0,"t":30,"l":0,"b":0})
+    # sort by totals
+    #product.update_layout(yaxis={'categoryorder':'total ascending'})
+    product.update_yaxes(categoryorder = 'array', 
+                         categoryarray = ordered_categories[::-1])
+    return product
+
+# Patch the data of the product category bar chart
+def patch_product(selection, ordered_categories):
+    """
+    Build a partial update of the product category bar chart.
+
+    Args:
+        selection (pd.DataFrame): Category, Amount and Percentage columns.
+        ordered_categories (list): Categories in display order, top first.
+
+    Returns:
+        dash.Patch: Partial update of the bars, hover data and category order.
+    """
+    patch = Patch()
+    patch['data'][0]['x'] = selection['Amount'].tolist()
+    patch['data'][0]['y'] = selection['Category'].tolist()
+    patch['data'][0]['customdata'] = selection[['Percentage']].values.tolist()
+    patch['layout']['yaxis']['categoryarray'] = ordered_categories[::-1]
+    return patch
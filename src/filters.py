@@ -0,0 +1,222 @@
+import hashlib
+import json
+from dataclasses import dataclass, fields, replace
+import numpy as np
+import pandas as pd
+
+# Columns the dashboard filters on
+FILTER_COLUMNS = ['year_month', 'year_week', 'Status', 'Fulfilment', 'state', 'Category', 'is_promotion']
+
+# Build integer codes for the filterable columns
+def build_filter_index(df, columns=FILTER_COLUMNS):
+    """
+    Precompute integer codes for the filterable columns.
+
+    Only the codes are kept per row: the mask of a value is computed from them
+    when needed, so the index stays a few bytes per row.
+
+    Args:
+        df (pd.DataFrame): Rows to index, e.g. the cells of a cube.
+        columns (list): Columns to index.
+
+    Returns:
+        dict: Number of indexed rows and, per column, its codes, sorted values,
+            and value-to-code lookup.
+    """
+    index = {"n_rows": len(df), "columns": {}}
+    for column in columns:
+        codes, values = pd.factorize(df[column], sort=True)
+        values = values.tolist()
+        index["columns"][column] = {
+            "codes": codes,
+            "values": values,
+            "lookup": {value: code for code, value in enumerate(values)}
+        }
+    return index
+
+def _column_mask(column_index, accepted):
+    """
+    Resolve the accepted value(s) of a single column to a boolean mask.
+
+    Args:
+        column_index (dict): Index entry of the column.
+        accepted: A single value or a list/tuple/set of values.
+
+    Returns:
+        np.ndarray: Boolean mask of the rows holding an accepted value.
+    """
+    lookup = column_index["lookup"]
+    if not isinstance(accepted, (list, tuple, set, frozenset)):
+        code = lookup.get(accepted)
+        if code is None:
+            return np.zeros(column_index["codes"].shape[0], dtype=bool)
+        return column_index["codes"] == code
+
+    # Several values: one lookup table over the codes instead of OR-ing a mask per value.
+    # The extra last slot stays False so missing values (code -1) never match.
+    accepted_codes = [lookup[value] for value in accepted if value in lookup]
+    table = np.zeros(len(column_index["values"]) + 1, dtype=bool)
+    table[accepted_codes] = True
+    return table[column_index["codes"]]
+
+# Resolve filter conditions to a row mask
+def filter_mask(index, conditions):
+    """
+    Resolve filter conditions to a boolean row mask by AND-ing per-column masks.
+
+    Args:
+        index (dict): Filter index built by `build_filter_index`.
+        conditions (dict): Mapping of column name to an accepted value or list of values.
+
+    Returns:
+        np.ndarray: Boolean mask of the rows that satisfy every condition.
+    """
+    mask = np.ones(index["n_rows"], dtype=bool)
+    for column, accepted in conditions.items():
+        np.logical_and(mask, _column_mask(index["columns"][column], accepted), out=mask)
+    return mask
+
+# Canonical description of the dashboard filters
+@dataclass(frozen=True)
+class FilterSpec:
+    """
+    Canonical, hashable description of the dashboard filters.
+
+    Attributes:
+        granularity (str): "Monthly" or "Weekly".
+        start (int): Index of the first selected period.
+        end (int): Index of the last selected period.
+        promo (bool): Whether only orders with promotions are selected.
+        fulfilment (str): "Amazon", "Merchant" or "Both".
+        statuses (tuple): Sorted order status groups, empty for all statuses.
+        state (str): Selected state, None for all states.
+    """
+    granularity: str = "Monthly"
+    start: int = 0
+    end: int = 0
+    promo: bool = False
+    fulfilment: str = "Both"
+    statuses: tuple = ()
+    state: str = None
+
+    def __post_init__(self):
+        # Normalize so that equivalent selections compare, hash and serialize equally
+        object.__setattr__(self, "start", int(self.start))
+        object.__setattr__(self, "end", int(self.end))
+        object.__setattr__(self, "promo", bool(self.promo))
+        object.__setattr__(self, "statuses", tuple(sorted(set(self.statuses or ()))))
+        object.__setattr__(self, "state", self.state or None)
+
+    def to_dict(self):
+        """
+        Serialize the filter spec to its canonical JSON-compatible form.
+
+        Returns:
+            dict: Canonical filter spec.
+        """
+        return {
+            "granularity": self.granularity,
+            "start": self.start,
+            "end": self.end,
+            "promo": self.promo,
+            "fulfilment": self.fulfilment,
+            "statuses": list(self.statuses),
+            "state": self.state
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a filter spec from its serialized form.
+
+        Args:
+            data (dict): Serialized filter spec, e.g. from the filter_condition store.
+
+        Returns:
+            FilterSpec: The filter spec.
+        """
+        return cls(**{field.name: data[field.name] for field in fields(cls) if field.name in data})
+
+    @property
+    def key(self):
+        """
+        Stable hash of the canonical form, identical across processes and restarts.
+
+        Returns:
+            str: Hex digest of the filter spec.
+        """
+        canonical = json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    @property
+    def period_column(self):
+        """
+        Name of the time column the spec filters on.
+
+        Returns:
+            str: "year_month" or "year_week".
+        """
+        return "year_month" if self.granularity == "Monthly" else "year_week"
+
+    def without(self, *dimensions):
+        """
+        Copy of the filter spec with the given dimensions reset to "no filter".
+
+        Args:
+            *dimensions (str): Any of "promo", "fulfilment", "statuses" and "state".
+
+        Returns:
+            FilterSpec: The relaxed filter spec.
+        """
+        return replace(self, **{dimension: getattr(FilterSpec, dimension) for dimension in dimensions})
+
+    def periods(self, month_labels, week_labels):
+        """
+        Labels of the selected periods.
+
+        Args:
+            month_labels (dict): Mapping of slider index to month label.
+            week_labels (dict): Mapping of slider index to week label.
+
+        Returns:
+            list: Selected month or week labels, in order.
+        """
+        labels = month_labels if self.granularity == "Monthly" else week_labels
+        return [labels[i] for i in range(self.start, self.end + 1)]
+
+    def conditions(self, month_labels, week_labels, status_mapping):
+        """
+        Translate the filter spec to the column conditions of the filter engine.
+
+        Args:
+            month_labels (dict): Mapping of slider index to month label.
+            week_labels (dict): Mapping of slider index to week label.
+            status_mapping (dict): Mapping of status group to order statuses.
+
+        Returns:
+            dict: Mapping of column name to an accepted value or list of values.
+        """
+        conditions = {self.period_column: self.periods(month_labels, week_labels)}
+        conditions.update(self.dimension_conditions(status_mapping))
+        return conditions
+
+    def dimension_conditions(self, status_mapping):
+        """
+        Translate the non-time part of the filter spec to filter engine conditions.
+
+        Args:
+            status_mapping (dict): Mapping of status group to order statuses.
+
+        Returns:
+            dict: Mapping of column name to an accepted value or list of values.
+        """
+        conditions = {}
+        if self.promo:
+            conditions["is_promotion"] = True
+        if self.fulfilment != "Both":
+            conditions["Fulfilment"] = self.fulfilment
+        if self.statuses:
+            conditions["Status"] = [item for key, values in status_mapping.items() for item in values if key in self.statuses]
+        if self.state:
+            conditions["state"] = self.state
+        return conditions
@@ -0,0 +1,277 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+import pandas as pd
+from .backends import CubeBackend
+from .data import SALES_SCHEMA, append_rows, dataset_version, month_over_month, period_labels
+from .kpis import period_totals
+from .query import QueryEngine
+
+# File types accepted in the inbox
+BATCH_EXTENSIONS = ('.parquet', '.csv')
+
+# Immutable state of the data the dashboard serves
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    """
+    One consistent version of the sales data and everything derived from it.
+
+    Callbacks take the current snapshot once per call, so a swap in the middle of
+    a request never mixes two versions.
+
+    Attributes:
+        version (str): Version of the data, every cache is keyed by it.
+        df (pd.DataFrame): Sales data.
+        preprocessed_data (dict): Output of `preprocess_data` for the sales data.
+        queries (QueryEngine): Query engine over the sales data.
+        map_states (list): States of the map, in the order of its values.
+        batches (tuple): File names of the ingested batches.
+    """
+    version: str
+    df: pd.DataFrame
+    preprocessed_data: dict
+    queries: QueryEngine = field(repr=False)
+    map_states: list
+    batches: tuple = ()
+
+    @property
+    def status_mapping(self):
+        return self.preprocessed_data["status_mapping"]
+
+    @property
+    def month_labels(self):
+        return self.preprocessed_data["month_labels"]
+
+    @property
+    def week_labels(self):
+        return self.preprocessed_data["week_labels"]
+
+# Build a snapshot from fully loaded data
+def build_snapshot(df, preprocessed_data, version, map_states=None, batches=(), backend=None):
+    """
+    Build a snapshot and its query engine.
+
+    Args:
+        df (pd.DataFrame): Sales data.
+        preprocessed_data (dict): Output of `preprocess_data`, or its incremental update.
+        version (str): Version of the data.
+        map_states (list): States of the map, by default in order of appearance.
+        batches (tuple): File names of the ingested batches.
+        backend (QueryBackend): Query backend, by default the cubes of the preprocessed data.
+
+    Returns:
+        Snapshot: The snapshot.
+    """
+    if backend is None:
+        backend = CubeBackend(preprocessed_data["cubes"])
+    queries = QueryEngine(backend, preprocessed_data["month_labels"], preprocessed_data["week_labels"],
+                          preprocessed_data["status_mapping"], version=version)
+    if map_states is None:
+        map_states = df['state'].unique().tolist()
+    return Snapshot(version, df, preprocessed_data, queries, map_states, tuple(batches))
+
+# Apply a batch of new rows to a snapshot
+def append_batch(snapshot, new_rows, name, batch_version):
+    """
+    Build the snapshot of the sales data with a batch of summarized rows appended.
+
+    The cubes are extended from the current ones and the new rows
+    only; the current snapshot is left unchanged and keeps serving meanwhile.
+
+    Args:
+        snapshot (Snapshot): Current snapshot.
+        new_rows (pd.DataFrame): Summarized rows in the processed data schema.
+        name (str): File name of the batch.
+        batch_version (str): Version of the batch file, see `data.dataset_version`.
+
+    Returns:
+        Snapshot: The new snapshot.
+    """
+    if not isinstance(snapshot.queries.backend, CubeBackend):
+        raise ValueError("batches can only be appended to data held in memory")
+    old = snapshot.preprocessed_data
+    df = append_rows(snapshot.df, new_rows)
+    appended = df.iloc[len(snapshot.df):]
+
+    # labels of the whole history, the sales data only holds the recent months with DASHBOARD_HOT_MONTHS
+    months, weeks = period_labels(appended)
+    months = sorted(set(old["month_labels"].values()).union(months))
+    weeks = sorted(set(old["week_labels"].values()).union(weeks), key=lambda x: pd.to_datetime(x.split('/')[0]))
+    backend = snapshot.queries.backend.extended(appended, {"Monthly": months, "Weekly": weeks})
+    # totals of the last two months from the cube, per status for the completion rate
+    last_months = months[-2:]
+    by_month = backend.series("Monthly", len(months) - len(last_months), len(months) - 1,
+                              {}, by="Status").reset_index()
+
+    preprocessed_data = {
+        **old,
+        "month_labels": {i: label for i, label in enumerate(months)},
+        "week_labels": {i: label for i, label in enumerate(weeks)},
+        **month_over_month(period_totals(by_month, "year_month", last_months)),
+        "cubes": backend.cubes
+    }
+
+    # new states go after the current ones, so maps already in the browser stay aligned
+    map_states = snapshot.map_states + [state for state in appended['state'].unique().tolist()
+                                        if state not in snapshot.map_states]
+    version = hashlib.sha1(f"{snapshot.version}:{batch_version}".encode()).hexdigest()[:12]
+    return build_snapshot(df, preprocessed_data, version, map_states, snapshot.batches + (name,), backend)
+
+# Read a batch file of summarized rows
+def read_batch(path, schema=SALES_SCHEMA):
+    """
+    Read a batch of summarized rows, in the schema of the processed data.
+
+    Args:
+        path (str): File path to a parquet or CSV file.
+        schema (dict): Mapping of column name to its kind or dtype.
+
+    Returns:
+        pd.DataFrame: The rows of the batch.
+    """
+    if path.endswith('.parquet'):
+        new_rows = pd.read_parquet(path)
+    else:
+        new_rows = pd.read_csv(path)
+    missing = set(schema).difference(new_rows.columns)
+    if missing:
+        raise ValueError(f"missing columns {sorted(missing)}")
+    return new_rows[list(schema)]
+
+class LiveData:
+    """
+    Holder of the current snapshot, swapped atomically when new data is ingested.
+    """
+
+    def __init__(self, snapshot):
+        """
+        Args:
+            snapshot (Snapshot): Initial snapshot.
+        """
+        self._current = snapshot
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def current(self):
+        """
+        The snapshot to serve.
+
+        Returns:
+            Snapshot: Current snapshot.
+        """
+        return self._current
+
+    def on_swap(self, listener):
+        """
+        Register a function called with the new snapshot after every swap.
+
+        Args:
+            listener (callable): Function taking the new snapshot.
+        """
+        self._listeners.append(listener)
+
+    def swap(self, snapshot):
+        """
+        Serve a new snapshot from now on.
+
+        Args:
+            snapshot (Snapshot): New snapshot.
+        """
+        with self._lock:
+            # a single reference assignment, requests see either the old or the new snapshot
+            self._current = snapshot
+        for listener in self._listeners:
+            listener(snapshot)
+
+    def ingest(self, paths):
+        """
+        Append batch files to the current snapshot and swap the result in.
+
+        Args:
+            paths (list): File paths of the batches, applied in order.
+
+        Returns:
+            int: Number of batches ingested, failed batches are skipped.
+        """
+        snapshot = self.current
+        n_batches = 0
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                new_rows = read_batch(path)
+                snapshot = append_batch(snapshot, new_rows, os.path.basename(path), dataset_version(path))
+            except Exception as e:
+                print(f"Error ingesting {path}: {e}")
+                continue
+            n_batches += 1
+            print(f"Ingested {len(new_rows):,} rows from {path} in {time.perf_counter() - start:.2f} s")
+        if n_batches:
+            self.swap(snapshot)
+        return n_batches
+
+class BatchWatcher(threading.Thread):
+    """
+    Thread polling an inbox directory and ingesting new batch files.
+
+    Batches are applied in file name order and left in place, so every worker
+    (and a restarted one) applies the same batches on top of the processed data.
+    Write batches under another name and rename them into the inbox, or they may
+    be picked up half written; files changed in the last `settle` seconds wait
+    for the next poll.
+    """
+
+    def __init__(self, inbox, live_data, interval=30, settle=5):
+        """
+        Args:
+            inbox (str): Directory to watch.
+            live_data (LiveData): Holder of the snapshot to update.
+            interval (float): Seconds between two polls.
+            settle (float): Seconds a file must be unchanged before it is ingested.
+        """
+        super().__init__(name="batch-watcher", daemon=True)
+        self.inbox = inbox
+        self.live_data = live_data
+        self.interval = interval
+        self.settle = settle
+        self.failed = set()
+
+    def pending(self):
+        """
+        List the batch files not ingested yet.
+
+        Returns:
+            list: File paths, in file name order.
+        """
+        ingested = set(self.live_data.current.batches) | self.failed
+        now = time.time()
+        paths = []
+        for name in sorted(os.listdir(self.inbox)):
+            path = os.path.join(self.inbox, name)
+            if (name.startswith('.') or not name.endswith(BATCH_EXTENSIONS) or name in ingested
+                    or os.path.getmtime(path) > now - self.settle):
+                continue
+            paths.append(path)
+        return paths
+
+    def poll(self):
+        """
+        Ingest the pending batch files.
+        """
+        paths = self.pending()
+        if paths and self.live_data.ingest(paths) < len(paths):
+            # do not retry broken files on every poll
+            ingested = set(self.live_data.current.batches)
+            self.failed.update(os.path.basename(path) for path in paths
+                               if os.path.basename(path) not in ingested)
+
+    def run(self):
+        os.makedirs(self.inbox, exist_ok=True)
+        while True:
+            try:
+                self.poll()
+            except OSError as e:
+                print(f"Error reading the inbox {self.inbox}: {e}")
+            time.sleep(self.interval)
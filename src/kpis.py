@@ -0,0 +1,107 @@
+# Order statuses counted as completed
+COMPLETED_STATUS = ["Shipped", "Shipped - Delivered to Buyer", "Shipped - Picked Up", "Shipped - Out for Delivery"]
+
+# Number of periods per year, used to annualize growth rates
+PERIODS_PER_YEAR = {"Monthly": 12, "Weekly": 52}
+
+# Compound annual growth rate between two values
+def calculate_cagr(begin, end, time_years):
+    """
+    Calculate the Compound Annual Growth Rate (CAGR).
+
+    Args:
+        begin (float): Value at the start of the range.
+        end (float): Value at the end of the range.
+        time_years (float): Length of the range in years.
+
+    Returns:
+        float: Growth rate in percent, None if the start value is 0.
+    """
+    if begin == 0:
+        return None  # Prevent division by zero
+    if time_years > 0:
+        return ((end / begin) ** (1 / time_years) - 1) * 100
+    return 0  # Default if time period is invalid
+
+# Per-period totals of the KPI measures
+def period_totals(frame, period_column, periods):
+    """
+    Aggregate revenue, quantity, orders and completed orders per period in one pass.
+
+    The frame can hold raw rows or pre-aggregated data, every row is weighted by its
+    order_count.
+
+    Args:
+        frame (pd.DataFrame): Data with the period column, Status, Amount, Qty and order_count.
+        period_column (str): "year_month" or "year_week".
+        periods (list): Labels of the periods of the range, in order.
+
+    Returns:
+        pd.DataFrame: One row per period with Amount, Qty, order_count, completed_orders and completion_rate.
+    """
+    frame = frame.assign(completed_orders=frame["order_count"].where(frame["Status"].isin(COMPLETED_STATUS), 0))
+    totals = (
+        frame.groupby(period_column, observed=True)[["Amount", "Qty", "order_count", "completed_orders"]].sum()
+        .reindex(periods, fill_value=0)
+    )
+    totals["completion_rate"] = (totals["completed_orders"] / totals["order_count"].where(totals["order_count"] > 0)).fillna(0) * 100
+    return totals
+
+# Revenue, quantity and completion rate KPIs of a period range
+def compute_kpis(frame, period_column, periods, granularity):
+    """
+    Compute the totals, begin and end values and growth rates of the dashboard KPIs.
+
+    Args:
+        frame (pd.DataFrame): Data with the period column, Status, Amount, Qty and order_count.
+        period_column (str): "year_month" or "year_week".
+        periods (list): Labels of the periods of the range, in order.
+        granularity (str): "Monthly" or "Weekly".
+
+    Returns:
+        dict: For "revenue", "quantity" and "completion_rate" a dict of total, begin,
+            end and growth; plus the per-period table under "by_period".
+    """
+    return _range_kpis(period_totals(frame, period_column, periods), granularity)
+
+# KPIs of many period ranges of the same filters
+def compute_kpis_batch(frame, period_column, periods, ranges, granularity):
+    """
+    Compute the dashboard KPIs of many period ranges with one aggregation.
+
+    The per-period totals are aggregated once over all periods and every range
+    only slices them, e.g. for the specs of a warmup that differ in their range.
+
+    Args:
+        frame (pd.DataFrame): Data with the period column, Status, Amount, Qty and order_count.
+        period_column (str): "year_month" or "year_week".
+        periods (list): Labels of all periods covered by the ranges, in order.
+        ranges (list): (first, last) positions in `periods` of each range.
+        granularity (str): "Monthly" or "Weekly".
+
+    Returns:
+        list: The KPIs of each range, as returned by `compute_kpis`.
+    """
+    by_period = period_totals(frame, period_column, periods)
+    return [_range_kpis(by_period.iloc[first:last + 1], granularity) for first, last in ranges]
+
+def _range_kpis(by_period, granularity):
+    time_years = len(by_period) / PERIODS_PER_YEAR[granularity]
+    begin, end = by_period.iloc[0], by_period.iloc[-1]
+
+    orders = by_period["order_count"].sum()
+    completion_rate = by_period["completed_orders"].sum() / orders * 100 if orders > 0 else 0
+
+    kpis = {"by_period": by_period}
+    for name, column, total in [
+        ("revenue", "Amount", by_period["Amount"].sum()),
+        ("quantity", "Qty", by_period["Qty"].sum()),
+        ("completion_rate", "completion_rate", completion_rate)
+    ]:
+        kpis[name] = {
+            "total": total,
+            "begin": begin[column],
+            "end": end[column],
+            "growth": calculate_cagr(begin[column], end[column], time_years)
+        }
+    return kpis
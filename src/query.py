@@ -0,0 +1,184 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, replace
+import pandas as pd
+from .kpis import compute_kpis, compute_kpis_batch
+from .singleflight import SingleFlight
+from .timing import stage
+
+# Materialized answer to one filter spec
+@dataclass(eq=False)
+class QueryResult:
+    """
+    Standard rollups and KPIs for one filter spec.
+
+    Attributes:
+        spec (FilterSpec): The filter spec the result answers.
+        totals (dict): Totals of Amount, Qty and order_count.
+        by_period (pd.DataFrame): Totals per period of the selected range.
+        by_state (pd.DataFrame): Totals per state, ignoring the state filter so every state can be shown.
+        by_category (pd.DataFrame): Totals per product category.
+        by_status (pd.DataFrame): Totals per order status.
+        kpis (dict): Dashboard KPIs computed by `compute_kpis`.
+    """
+    spec: object
+    totals: dict
+    by_period: pd.DataFrame
+    by_state: pd.DataFrame
+    by_category: pd.DataFrame
+    by_status: pd.DataFrame
+    kpis: dict
+
+class QueryEngine:
+    """
+    Runs each distinct filter spec once and shares the result between callbacks.
+
+    One filter change fires several callbacks with the same spec; the first one
+    computes the QueryResult and the others reuse it, waiting for it if it is
+    still being computed. Results are kept in a small LRU keyed on the data
+    version and the spec's stable key.
+    """
+
+    def __init__(self, backend, month_labels, week_labels, status_mapping, maxsize=128, version=None):
+        """
+        Args:
+            backend (QueryBackend): Backend computing the sums and selecting the rows.
+            month_labels (dict): Mapping of slider index to month label.
+            week_labels (dict): Mapping of slider index to week label.
+            status_mapping (dict): Mapping of status group to order statuses.
+            maxsize (int): Number of results to keep.
+            version (str): Version of the sales data, see `data.dataset_version`.
+        """
+        self.backend = backend
+        self.month_labels = month_labels
+        self.week_labels = week_labels
+        self.status_mapping = status_mapping
+        self.maxsize = maxsize
+        self.version = version
+        self._results = OrderedDict()
+        self._in_flight = SingleFlight()
+        self._lock = threading.Lock()
+        # a process forked while another thread holds the lock (a background callback job) gets a free
+        # one; a weak reference, so the engines of replaced snapshots can still be freed
+        reset_lock = weakref.WeakMethod(self._reset_lock)
+        os.register_at_fork(after_in_child=lambda: reset_lock() is not None and reset_lock()())
+
+    def run(self, spec):
+        """
+        Get the query result of a filter spec, computing it on first use.
+
+        Args:
+            spec (FilterSpec): The filter spec.
+
+        Returns:
+            QueryResult: The shared result.
+        """
+        key = (self.version, spec.key)
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                return result
+
+        # concurrent requests of the same spec, e.g. the callbacks of one filter change or
+        # users opening the dashboard together, wait for a single computation
+        with stage("query"):
+            result, shared = self._in_flight.run(key, lambda: self._compute(spec))
+        if not shared:
+            self._keep(key, result)
+        return result
+
+    def run_many(self, specs):
+        """
+        Get the query results of many filter specs, e.g. to warm the cache or build a report.
+
+        Specs that only differ in their period range share one aggregation of the
+        KPIs over all their periods, see `kpis.compute_kpis_batch`.
+
+        Args:
+            specs (list): The filter specs.
+
+        Returns:
+            list: The shared QueryResult of each spec, in order.
+        """
+        results = {}
+        missing = {}
+        with self._lock:
+            for spec in specs:
+                result = self._results.get((self.version, spec.key))
+                if result is not None:
+                    results[spec.key] = result
+                else:
+                    missing[spec.key] = spec
+
+        # specs with the same filters apart from the range, keyed by that filter without a range
+        groups = defaultdict(list)
+        for spec in missing.values():
+            groups[replace(spec, start=0, end=0)].append(spec)
+
+        for base, group in groups.items():
+            first = min(spec.start for spec in group)
+            last = max(spec.end for spec in group)
+            with stage("query"):
+                frame = self.backend.series(base.granularity, first, last,
+                                            base.dimension_conditions(self.status_mapping), by='Status')
+                all_kpis = compute_kpis_batch(
+                    frame.reset_index(), base.period_column,
+                    replace(base, start=first, end=last).periods(self.month_labels, self.week_labels),
+                    [(spec.start - first, spec.end - first) for spec in group], base.granularity
+                )
+                for spec, kpis in zip(group, all_kpis):
+                    key = (self.version, spec.key)
+                    result, shared = self._in_flight.run(key, lambda: self._compute(spec, kpis))
+                    if not shared:
+                        self._keep(key, result)
+                    results[spec.key] = result
+        return [results[spec.key] for spec in specs]
+
+    def _keep(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """
+        Drop the kept results, e.g. to time the queries from scratch.
+        """
+        with self._lock:
+            self._results.clear()
+
+    def _compute(self, spec, kpis=None):
+        """
+        Compute the rollups and KPIs of a filter spec.
+
+        Args:
+            spec (FilterSpec): The filter spec.
+            kpis (dict): KPIs of the spec if already computed, e.g. by `run_many`.
+
+        Returns:
+            QueryResult: The computed result.
+        """
+        backend = self.backend
+        period_range = (spec.granularity, spec.start, spec.end)
+        conditions = spec.dimension_conditions(self.status_mapping)
+        if kpis is None:
+            by_period_status = backend.series(*period_range, conditions, by='Status').reset_index()
+            kpis = compute_kpis(by_period_status, spec.period_column,
+                                spec.periods(self.month_labels, self.week_labels), spec.granularity)
+        return QueryResult(
+            spec=spec,
+            totals=backend.totals(*period_range, conditions),
+            by_period=backend.series(*period_range, conditions),
+            by_state=backend.rollup(*period_range, 'state',
+                                    spec.without('state').dimension_conditions(self.status_mapping)),
+            by_category=backend.rollup(*period_range, 'Category', conditions),
+            by_status=backend.rollup(*period_range, 'Status', conditions),
+            kpis=kpis
+        )
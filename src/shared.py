@@ -0,0 +1,151 @@
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import pyarrow as pa
+from .data import dataset_version, import_data, preprocess_data
+
+# Bump when the layout of the shared files changes, so old snapshots are rebuilt
+SHARED_FORMAT_VERSION = 2
+
+# Arrays at least this large are written to their own memory-mapped file
+MIN_SHARED_BYTES = 4096
+
+class _ArrayPickler(pickle.Pickler):
+    """
+    Pickler that stores large numpy arrays as .npy files next to the pickle.
+    """
+
+    def __init__(self, file, directory):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory = directory
+        self.n_arrays = 0
+
+    def persistent_id(self, obj):
+        if isinstance(obj, np.ndarray) and not obj.dtype.hasobject and obj.nbytes >= MIN_SHARED_BYTES:
+            name = f"array_{self.n_arrays}.npy"
+            self.n_arrays += 1
+            np.save(os.path.join(self.directory, name), obj)
+            return name
+        return None
+
+class _ArrayUnpickler(pickle.Unpickler):
+    """
+    Unpickler that maps the arrays stored by `_ArrayPickler` read-only.
+    """
+
+    def __init__(self, file, directory):
+        super().__init__(file)
+        self.directory = directory
+
+    def persistent_load(self, name):
+        return np.load(os.path.join(self.directory, name), mmap_mode='r')
+
+# Write the sales data and its derived structures to a shared snapshot
+def write_shared_data(df, preprocessed_data, directory):
+    """
+    Write the sales data as an Arrow IPC file and the preprocessed data (cubes,
+    labels) as a pickle whose large arrays are separate .npy files.
+
+    Args:
+        df (pd.DataFrame): Sales data.
+        preprocessed_data (dict): Output of `preprocess_data`.
+        directory (str): Empty directory to write the snapshot to.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(os.path.join(directory, 'sales.arrow'), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    with open(os.path.join(directory, 'preprocessed.pkl'), 'wb') as f:
+        pickler = _ArrayPickler(f, directory)
+        pickler.dump(preprocessed_data)
+
+    # written last, a snapshot without a manifest is incomplete
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump({"format_version": SHARED_FORMAT_VERSION,
+                   "rows": len(df),
+                   "arrays": pickler.n_arrays}, f)
+
+# Map a shared snapshot into this process
+def read_shared_data(directory):
+    """
+    Map the sales data and preprocessed data of a snapshot read-only.
+
+    The pages are backed by the files, so every process mapping the same snapshot
+    shares one copy of them in the page cache. Measures and arrays are used in
+    place; only the small integer codes of the categorical columns are copied.
+
+    Args:
+        directory (str): Directory of a complete snapshot.
+
+    Returns:
+        tuple: Sales data (pd.DataFrame) and preprocessed data (dict).
+    """
+    source = pa.memory_map(os.path.join(directory, 'sales.arrow'), 'r')
+    df = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+    with open(os.path.join(directory, 'preprocessed.pkl'), 'rb') as f:
+        preprocessed_data = _ArrayUnpickler(f, directory).load()
+    return df, preprocessed_data
+
+# Build the shared snapshot of the current source data if it does not exist yet
+def prepare_shared_data(source, shared_dir, version=None):
+    """
+    Build the shared snapshot of the source data once.
+
+    The snapshot is written to a temporary directory and renamed into place, so
+    concurrent workers never see a partial snapshot; if two of them race, the
+    first rename wins and the other copy is discarded. Snapshots of older
+    versions of the source are removed.
+
+    Args:
+        source (str): File path to the processed parquet file.
+        shared_dir (str): Directory holding the shared snapshots.
+        version (str): Version of the source data, computed by `dataset_version` if not given.
+
+    Returns:
+        str: Directory of the snapshot of the current source data.
+    """
+    snapshot = f"v{SHARED_FORMAT_VERSION}-{version or dataset_version(source)}"
+    directory = os.path.join(shared_dir, snapshot)
+    if os.path.exists(os.path.join(directory, 'manifest.json')):
+        return directory
+
+    os.makedirs(shared_dir, exist_ok=True)
+    temp_dir = os.path.join(shared_dir, f".{snapshot}.{os.getpid()}")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    df = import_data(source)
+    write_shared_data(df, preprocess_data(df), temp_dir)
+    try:
+        os.rename(temp_dir, directory)
+        print(f"Wrote shared data snapshot {directory}")
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # processes still mapping an old snapshot keep its files until they exit
+    for name in os.listdir(shared_dir):
+        if name != snapshot and not name.startswith('.'):
+            shutil.rmtree(os.path.join(shared_dir, name), ignore_errors=True)
+    return directory
+
+# Load the sales data and its derived structures from the shared snapshot
+def load_shared_data(source, shared_dir, version=None):
+    """
+    Load the sales data and preprocessed data from the shared snapshot of the
+    source, building the snapshot first if needed.
+
+    Args:
+        source (str): File path to the processed parquet file.
+        shared_dir (str): Directory holding the shared snapshots.
+        version (str): Version of the source data, computed by `dataset_version` if not given.
+
+    Returns:
+        tuple: Sales data (pd.DataFrame) and preprocessed data (dict).
+    """
+    directory = prepare_shared_data(source, shared_dir, version)
+    df, preprocessed_data = read_shared_data(directory)
+    print(f"Mapped {len(df):,} sales rows from {directory}")
+    return df, preprocessed_data
@@ -0,0 +1,104 @@
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # not on Windows, computations are then only coalesced within a process
+    fcntl = None
+
+class _Call:
+    # a computation in flight, and its outcome once done
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Runs concurrent calls for the same key once: the first caller computes, the
+    others wait for it and share its result (or its exception).
+
+    Nothing is kept once the computation is done, caching the result is up to the caller.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        # a process forked meanwhile (a background callback job) must not wait on computations
+        # of threads it does not have; a weak reference, so the owner can still be freed
+        reset = weakref.WeakMethod(self._reset)
+        os.register_at_fork(after_in_child=lambda: reset() is not None and reset()())
+
+    def _reset(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, function):
+        """
+        Compute `function()` for a key, or wait for the computation already in flight.
+
+        Args:
+            key: Hashable key of the computation.
+            function (callable): Function without arguments computing the result.
+
+        Returns:
+            tuple: The result, and whether it was shared from another caller's computation.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+# Hold a lock shared by the processes of the machine
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on a lock file, waiting for the process holding it.
+
+    The file is removed on release, so lock files do not pile up; a waiter that
+    gets the lock of a removed file locks the new one instead. Without `fcntl`
+    (Windows), nothing is locked.
+
+    Args:
+        path (str): File path of the lock file, in an existing directory.
+    """
+    if fcntl is None:
+        yield
+        return
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        # the holder before removed the file while this process waited for it
+        os.close(fd)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:  # the directory of an evicted data version
+            pass
+        os.close(fd)
@@ -0,0 +1,105 @@
+import pandas as pd
+from .backends import CubeBackend
+from .cube import CUBE_DIMENSIONS, CUBE_MEASURES, DataCube
+from .data import PARTITION_COLUMN, SALES_SCHEMA, STATUS_MAPPING, import_data, month_over_month
+from .kpis import period_totals
+
+class SalesStore:
+    """
+    Sales data on disk with only the most recent months held in memory.
+
+    At start only the rows of the recent months are read, plus the period and
+    state labels of the whole history. The cubes answering the dashboard queries
+    are laid out on every period but only hold the recent months: the older ones
+    are summed into them the first time a query reaches a period they contribute
+    to, see `backends.CubeBackend`. They are read one month at a time, only the
+    cube columns, and summed before the next one is read, so neither their rows
+    nor the history are ever in memory at once. Works on a single parquet file
+    too, pruning row groups only.
+
+    Attributes:
+        url (str): File path to the partitioned dataset or parquet file.
+        hot_months (int): Number of most recent months held in memory.
+        months (list): Month labels of the whole history, in order.
+        cold_months (list): Month labels left on disk.
+        cold_periods (dict): Mapping of time granularity to the labels of the periods holding
+            rows of the months left on disk.
+        states (list): States of the whole history, in order of appearance.
+    """
+
+    def __init__(self, url, hot_months, schema=SALES_SCHEMA):
+        """
+        Args:
+            url (str): File path to the partitioned dataset or parquet file.
+            hot_months (int): Number of most recent months to hold in memory, at least 1.
+            schema (dict): Mapping of column name to its kind or dtype.
+        """
+        self.url = url
+        self.hot_months = hot_months
+        self.schema = schema
+        self.months = []
+        self.cold_months = []
+        self.cold_periods = {"Monthly": set(), "Weekly": set()}
+        self.states = []
+
+    def _read(self, month, columns):
+        return pd.read_parquet(self.url, columns=columns, filters=[(PARTITION_COLUMN, '==', month)])
+
+    def load(self):
+        """
+        Read the rows of the recent months and the labels of the whole history, and
+        build the cubes of the recent months laid out on every period.
+
+        Returns:
+            tuple: Sales data of the recent months (pd.DataFrame), the preprocessed data
+                (dict, as from `preprocess_data`) of the whole history and the query
+                backend (CubeBackend) reading the older months when needed.
+        """
+        # only the label columns, dictionary-encoded and the month one free for a partitioned dataset
+        labels = pd.read_parquet(self.url, columns=[PARTITION_COLUMN, 'year_week', 'state'])
+        self.months = sorted(labels[PARTITION_COLUMN].unique())
+        sorted_weeks = sorted(labels['year_week'].unique(), key=lambda x: pd.to_datetime(x.split('/')[0]))
+        self.states = labels['state'].unique().tolist()
+        split = max(len(self.months) - self.hot_months, 0)
+        self.cold_months = self.months[:split]
+        cold = labels[PARTITION_COLUMN].isin(self.cold_months)
+        self.cold_periods = {"Monthly": set(self.cold_months),
+                             "Weekly": set(labels.loc[cold, 'year_week'].unique())}
+        del labels
+
+        df = import_data(self.url, self.schema, filters=[(PARTITION_COLUMN, 'in', self.months[split:])])
+        backend = CubeBackend({"Monthly": DataCube(df, "year_month", self.months),
+                               "Weekly": DataCube(df, "year_week", sorted_weeks)}, store=self)
+
+        # totals of the last two months per status for the completion rate, from the older
+        # months too if only one is held in memory
+        last_months = self.months[-2:]
+        by_month = backend.series("Monthly", len(self.months) - len(last_months), len(self.months) - 1,
+                                  {}, by="Status").reset_index()
+        preprocessed_data = {
+            "status_mapping": STATUS_MAPPING,
+            "month_labels": {i: label for i, label in enumerate(self.months)},
+            "week_labels": {i: label for i, label in enumerate(sorted_weeks)},
+            **month_over_month(period_totals(by_month, "year_month", last_months)),
+            "cubes": backend.cubes
+        }
+        print(f"Held {len(self.months) - len(self.cold_months)} of {len(self.months)} months in memory, "
+              f"{len(df):,} sales rows")
+        return df, preprocessed_data, backend
+
+    def read_cold(self):
+        """
+        Read the totals of the months left on disk.
+
+        Returns:
+            pd.DataFrame: One row per cube cell, month and week of the older months,
+                with the cube dimensions, the time columns and the summed measures.
+        """
+        # a cold month shrinks to one row per cube cell and week before the next is read
+        keys = CUBE_DIMENSIONS + ['year_month', 'year_week']
+        parts = []
+        for month in self.cold_months:
+            rows = self._read(month, keys + CUBE_MEASURES)
+            parts.append(rows.groupby(keys, observed=True, dropna=False)[CUBE_MEASURES].sum().reset_index())
+        print(f"Read the totals of {len(self.cold_months)} older months from disk")
+        return pd.concat(parts, ignore_index=True)
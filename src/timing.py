@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import numpy as np
+from flask import request
+
+# Number of most recent requests of each callback the percentiles are computed over
+TIMING_WINDOW = 1000
+
+# Percentiles reported by the metrics endpoint
+TIMING_PERCENTILES = [50, 90, 99]
+
+# Timings of the request served by the current thread
+_local = threading.local()
+
+# Whether the current request polls a background callback job
+def is_background_poll():
+    """
+    Tell the polls of a background callback job from the requests running a callback.
+
+    The browser polls a job with the request that started it plus the cacheKey and
+    job arguments; the callback itself runs in the job process.
+
+    Returns:
+        bool: True for a poll of a running or finished job.
+    """
+    return 'cacheKey' in request.args or 'job' in request.args
+
+# Time a stage of the callback being served
+@contextmanager
+def stage(name):
+    """
+    Add the time spent in the block to a stage of the current request.
+
+    Outside of a timed request (e.g. in the cache warmup) the block is not timed.
+
+    Args:
+        name (str): Name of the stage, e.g. "query" or "figure".
+    """
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0) + (time.perf_counter() - start) * 1000
+
+class CallbackTimings:
+    """
+    Rolling window of the stage timings and response sizes of every callback.
+
+    Attributes:
+        window (int): Number of most recent requests kept per callback.
+    """
+
+    def __init__(self, window=TIMING_WINDOW):
+        """
+        Args:
+            window (int): Number of most recent requests kept per callback.
+        """
+        self.window = window
+        self._requests = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, name, timings):
+        """
+        Keep the measurements of one request.
+
+        Args:
+            name (str): Name of the callback.
+            timings (dict): Milliseconds per stage, plus "total" and "response_bytes".
+        """
+        with self._lock:
+            self._requests[name].append(timings)
+
+    def summary(self):
+        """
+        Percentiles of every stage of every callback over the window.
+
+        Returns:
+            dict: Per callback, the number of requests and the mean and percentiles
+                of every stage and of the response size.
+        """
+        with self._lock:
+            requests = {name: list(measurements) for name, measurements in self._requests.items()}
+        summary = {}
+        for name, measurements in requests.items():
+            summary[name] = {'requests': len(measurements)}
+            # a stage skipped by a request, e.g. the query on a cache hit, took no time
+            keys = dict.fromkeys(key for timings in measurements for key in timings)
+            for key in keys:
+                values = [timings.get(key, 0) for timings in measurements]
+                percentiles = np.percentile(values, TIMING_PERCENTILES)
+                summary[name][key] = {
+                    'mean': float(np.mean(values)),
+                    **{f"p{p}": float(value) for p, value in zip(TIMING_PERCENTILES, percentiles)}
+                }
+        return summary
+
+# Time the callback requests of a Dash app
+def instrument(app, timings, path='/_dash-update-component'):
+    """
+    Time every callback request of the app and add a Server-Timing header to its response.
+
+    The header holds the total time, the stages timed with `stage` and the rest
+    ("dash": request parsing, dispatch and JSON encoding by Dash), plus the size
+    of the response, so the browser's network panel shows the breakdown.
+
+    Args:
+        app (dash.Dash): The app.
+        timings (CallbackTimings): Where the measurements are kept.
+        path (str): Path of the callback requests.
+    """
+    server = app.server
+
+    @server.before_request
+    def start_timing():
+        if request.path == path and not is_background_poll():
+            _local.timings = {}
+            _local.start = time.perf_counter()
+
+    @server.after_request
+    def finish_timing(response):
+        stages = getattr(_local, 'timings', None)
+        if stages is None or request.path != path:
+            return response
+        _local.timings = None
+
+        total = (time.perf_counter() - _local.start) * 1000
+        size = len(response.get_data())
+        measurements = {**stages, 'dash': max(total - sum(stages.values()), 0), 'total': total}
+        response.headers['Server-Timing'] = ', '.join(
+            [f"{key};dur={value:.1f}" for key, value in measurements.items()] + [f'response;desc="{size} bytes"'])
+
+        # the name of the function registered for the outputs of the request
+        output = (request.get_json(silent=True) or {}).get('output')
+        callback = app.callback_map.get(output, {}).get('callback')
+        timings.record(getattr(callback, '__name__', output), {**measurements, 'response_bytes': size})
+        return response
@@ -0,0 +1,40 @@
+import json
+import time
+from flask import request
+from .timing import is_background_poll
+
+# Record the inputs of every served callback to a trace file
+def record_traces(app, path, endpoint='/_dash-update-component'):
+    """
+    Append the inputs of every callback request of the app to a trace file, one
+    JSON object per line, for `utils/replay_trace.py` to replay.
+
+    Only the time, the name of the callback and its input and state values are
+    written: no address, header or cookie of the request. The values of the data
+    callbacks are the filter spec and the figure structures in the browser. The
+    polls of background callback jobs are not written.
+
+    Args:
+        app (dash.Dash): The app.
+        path (str): File path of the trace.
+        endpoint (str): Path of the callback requests.
+    """
+    @app.server.before_request
+    def record_trace():
+        # the polls of a background job repeat the request that started it
+        if request.path != endpoint or is_background_poll():
+            return
+        body = request.get_json(silent=True) or {}
+        callback = app.callback_map.get(body.get('output'), {}).get('callback')
+        if callback is None:
+            return
+        # the arguments of the callback: its inputs then its states, in order
+        args = [item.get('value') for item in body.get('inputs', []) + body.get('state', [])]
+        line = json.dumps({"t": round(time.time(), 3), "cb": callback.__name__, "args": args},
+                          separators=(",", ":")) + "\n"
+        try:
+            # a single short append, so lines of concurrent workers do not interleave
+            with open(path, 'a') as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Error writing the trace: {e}")
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from .filters import FilterSpec
+
+# Number of logged filter states to warm, most frequent first
+WARMUP_TOP_LOGGED = 20
+
+# Number of most recent log lines the frequencies are counted over
+WARMUP_LOG_LINES = 100000
+
+# Filter states every deployment sees first
+def default_specs(month_labels, week_labels, status_mapping):
+    """
+    Filter specs of the default view and of common ranges.
+
+    Args:
+        month_labels (dict): Mapping of slider index to month label.
+        week_labels (dict): Mapping of slider index to week label.
+        status_mapping (dict): Mapping of status group to order statuses.
+
+    Returns:
+        list: FilterSpecs of the default view (as set by the filter components),
+            the full range with all statuses, the last month and the last 4 weeks.
+    """
+    last_month, last_week = len(month_labels) - 1, len(week_labels) - 1
+    all_statuses = list(status_mapping)
+    return [
+        # defaults of the filter components, see components.py
+        FilterSpec("Monthly", 0, last_month, statuses=["Shipped"]),
+        FilterSpec("Weekly", 3, min(9, last_week), statuses=["Shipped"]),
+        FilterSpec("Monthly", 0, last_month, statuses=all_statuses),
+        FilterSpec("Monthly", last_month, last_month, statuses=["Shipped"]),
+        FilterSpec("Monthly", last_month, last_month, statuses=all_statuses),
+        FilterSpec("Weekly", max(0, last_week - 3), last_week, statuses=["Shipped"]),
+        FilterSpec("Weekly", max(0, last_week - 3), last_week, statuses=all_statuses),
+    ]
+
+# Append a filter state to the log the warmup learns the common states from
+def log_spec(path, filter_spec):
+    """
+    Append a served filter spec to the spec log, one JSON object per line.
+
+    Args:
+        path (str): File path of the spec log.
+        filter_spec (dict): Serialized filter spec.
+    """
+    line = json.dumps(FilterSpec.from_dict(filter_spec).to_dict(), separators=(",", ":")) + "\n"
+    try:
+        # a single short append, so lines of concurrent workers do not interleave
+        with open(path, 'a') as f:
+            f.write(line)
+    except OSError as e:
+        print(f"Error writing the spec log: {e}")
+
+# Most frequent filter states of the spec log
+def frequent_specs(path, top=WARMUP_TOP_LOGGED, max_lines=WARMUP_LOG_LINES):
+    """
+    Read the most frequent filter specs from the spec log.
+
+    Args:
+        path (str): File path of the spec log, may not exist yet.
+        top (int): Number of specs to return.
+        max_lines (int): Number of most recent lines to count.
+
+    Returns:
+        list: FilterSpecs, most frequent first.
+    """
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        lines = deque(f, maxlen=max_lines)
+
+    counts = Counter()
+    specs = {}
+    for line in lines:
+        try:
+            spec = FilterSpec.from_dict(json.loads(line))
+        except (ValueError, TypeError):  # truncated or malformed line
+            continue
+        counts[spec.key] += 1
+        specs[spec.key] = spec
+    return [specs[key] for key, _ in counts.most_common(top)]
+
+# Compute and cache the results and figures of filter states
+def warm_caches(specs, queries, chart_callbacks):
+    """
+    Run the shared queries and the cached chart callbacks of every filter spec.
+
+    Each chart callback is run for a first render (no figure in the browser) and
+    for an update of a figure of the same structure, the two calls a session makes.
+
+    Args:
+        specs (list): FilterSpecs to warm.
+        queries (QueryEngine): Shared query engine.
+        chart_callbacks (list): Memoized chart callbacks taking (filter_spec, structure)
+            and returning their outputs, the structure last.
+
+    Returns:
+        int: Number of distinct specs warmed.
+    """
+    # one batch shares the KPI aggregation of the specs, the callbacks then find their results
+    queries.run_many(specs)
+    warmed = set()
+    for spec in specs:
+        if spec.key in warmed:
+            continue
+        filter_spec = spec.to_dict()
+        for chart_callback in chart_callbacks:
+            structure = chart_callback(filter_spec, None)[-1]
+            chart_callback(filter_spec, structure)
+        warmed.add(spec.key)
+    return len(warmed)
+
+# Warm the caches in a background thread
+def start_warmup(specs, queries, chart_callbacks):
+    """
+    Warm the caches in a daemon thread, so the app serves requests meanwhile.
+
+    Args:
+        specs (list): FilterSpecs to warm, in order of priority.
+        queries (QueryEngine): Shared query engine.
+        chart_callbacks (list): Memoized chart callbacks, see `warm_caches`.
+
+    Returns:
+        threading.Thread: The started thread.
+    """
+    def warm():
+        start = time.perf_counter()
+        try:
+            n_specs = warm_caches(specs, queries, chart_callbacks)
+        except Exception as e:
+            print(f"Error warming the caches: {e}")
+            return
+        print(f"Warmed the caches for {n_specs} filter states in {time.perf_counter() - start:.1f} s")
+
+    thread = threading.Thread(target=warm, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,12 @@
+import pytest
+from src.data import DATA_PATH, import_data, preprocess_data
+
+# Bundled processed sales data, shared by the tests of one run
+@pytest.fixture(scope="session")
+def sales_data():
+    return import_data(DATA_PATH)
+
+# Preprocessed data and cubes of the bundled sales data
+@pytest.fixture(scope="session")
+def preprocessed_data(sales_data):
+    return preprocess_data(sales_data)
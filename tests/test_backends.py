@@ -0,0 +1,52 @@
+import shutil
+import pandas as pd
+import pytest
+from src.backends import CubeBackend, QueryBackend
+from src.data import DATA_PATH
+
+
+@pytest.fixture(scope="module")
+def duckdb_backend(tmp_path_factory):
+    pytest.importorskip("duckdb")
+    from src.backends import DuckDBBackend
+
+    # a quote in the path must not end the SQL string of the view
+    path = tmp_path_factory.mktemp("it's") / "sales.parquet"
+    shutil.copy(DATA_PATH, path)
+    backend = DuckDBBackend(str(path), memory_limit="1GB", threads=2)
+    yield backend
+    backend.close()
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        QueryBackend()
+
+
+@pytest.mark.parametrize("by", ["state", "Status", "Category"])
+@pytest.mark.parametrize("top", [1, 3, 50])
+def test_cube_rollup_top_keeps_the_largest(preprocessed_data, by, top):
+    backend = CubeBackend(preprocessed_data["cubes"])
+
+    rollup = backend.rollup("Monthly", 0, 2, by, {})
+    largest = backend.rollup("Monthly", 0, 2, by, {}, top=top)
+
+    assert len(largest) == min(top, len(rollup))
+    assert largest["Amount"].is_monotonic_decreasing
+    pd.testing.assert_frame_equal(largest, rollup.loc[largest.index])
+    others = rollup.drop(largest.index)
+    assert others.empty or largest["Amount"].iloc[-1] >= others["Amount"].max()
+
+
+@pytest.mark.parametrize("conditions", [{}, {"Status": ["Cancelled"]}, {"state": "Maharashtra"}])
+@pytest.mark.parametrize("top", [None, 2, 40])
+def test_duckdb_rollup_matches_cubes(preprocessed_data, duckdb_backend, conditions, top):
+    cubes = CubeBackend(preprocessed_data["cubes"])
+    for by in ["state", "Status", "Category", "Fulfilment"]:
+        pd.testing.assert_frame_equal(duckdb_backend.rollup("Weekly", 1, 9, by, conditions, top=top),
+                                      cubes.rollup("Weekly", 1, 9, by, conditions, top=top), check_dtype=False)
+
+
+def test_duckdb_settings(duckdb_backend):
+    settings = duckdb_backend._query("SELECT current_setting('threads') AS threads")
+    assert settings["threads"].iloc[0] == 2
@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+import pytest
+from src import cache as cache_module
+from src.cache import FigureCache, callback_key
+from src.singleflight import SingleFlight
+
+SPEC = {"granularity": "Monthly", "start": 0, "end": 2, "promo": False, "fulfilment": "Both",
+        "statuses": [], "state": None}
+
+
+class Clock:
+    # stands in for the time module of the cache
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def disk_entries(cache):
+    return sorted(name for name in os.listdir(cache.path) if name.endswith(".json"))
+
+
+def test_callback_key_follows_the_canonical_spec():
+    shuffled = {**SPEC, "statuses": ["Shipped", "Cancelled"], "start": "0"}
+
+    assert callback_key(shuffled, None) == callback_key({**SPEC, "statuses": ["Cancelled", "Shipped"]}, None)
+    assert callback_key(SPEC, None) != callback_key(SPEC, {"traces": 1})
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = FigureCache(str(tmp_path), version="a", ttl=60)
+    cache.set("chart", "k", "value")
+    other_worker = FigureCache(str(tmp_path), version="a", ttl=60)
+
+    clock.now += 59
+    assert cache.get("chart", "k") == "value"
+    assert other_worker.get("chart", "k") == "value"
+
+    clock.now += 2
+    assert cache.get("chart", "k") is None
+    assert FigureCache(str(tmp_path), version="a", ttl=60).get("chart", "k") is None
+    assert disk_entries(cache) == []
+    assert cache.stats()["callbacks"]["chart"]["expired"] == 2
+
+
+def test_new_version_evicts_the_entries_of_the_others(tmp_path):
+    cache = FigureCache(str(tmp_path), version="a")
+    cache.set("chart", "k", "old")
+
+    cache.set_version("b")
+
+    assert cache.get("chart", "k") is None
+    assert os.listdir(tmp_path) == ["data-b"]
+    # a value computed for the previous version is dropped
+    cache.set("chart", "k", "stale", version="a")
+    assert cache.get("chart", "k") is None
+    cache.set("chart", "k", "new", version="b")
+    assert cache.get("chart", "k") == "new"
+
+
+def test_memory_tier_keeps_the_most_recent_entries(tmp_path):
+    cache = FigureCache(None, max_entries=2)
+    for key in ["a", "b", "c"]:
+        cache.set("chart", key, key)
+
+    assert cache.get("chart", "a") is None
+    assert [cache.get("chart", key) for key in ["b", "c"]] == ["b", "c"]
+    assert cache.stats()["callbacks"]["chart"]["evictions"] == 1
+
+
+def test_disk_tier_stays_under_its_size_limit(tmp_path):
+    value = "x" * 1000
+    cache = FigureCache(str(tmp_path), version="a", max_entries=1, max_disk_bytes=5000)
+    for i in range(5):
+        cache.set("chart", f"k{i}", value)
+        time.sleep(0.01)
+    # reading the first entry makes it the most recently used
+    assert cache.get("chart", "k0") == value
+
+    cache.set("chart", "k5", value)
+
+    sizes = [os.path.getsize(os.path.join(cache.path, name)) for name in disk_entries(cache)]
+    assert sum(sizes) <= 5000 * 0.9
+    assert cache.stats()["disk_bytes"] == sum(sizes)
+    assert "chart-k0.json" in disk_entries(cache)
+    assert "chart-k1.json" not in disk_entries(cache)
+    assert cache.stats()["callbacks"]["chart"]["disk_evictions"] == 2
+
+
+def test_memoize_serves_hits_from_both_tiers(tmp_path):
+    calls = []
+
+    def create_chart(filter_spec, structure):
+        calls.append(filter_spec)
+        return {"figure": filter_spec["start"]}, structure
+
+    cache = FigureCache(str(tmp_path), version="a")
+    cached = cache.memoize()(create_chart)
+    other_worker = FigureCache(str(tmp_path), version="a").memoize()(create_chart)
+
+    assert cached(SPEC, None) == ({"figure": 0}, None)
+    assert cached({**SPEC, "statuses": ()}, None) == ({"figure": 0}, None)
+    assert other_worker(SPEC, None) == ({"figure": 0}, None)
+
+    assert len(calls) == 1
+    assert cache.stats()["callbacks"]["create_chart"]["hits"] == 1
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    leader = threading.Thread(target=lambda: results.append(flight.run("key", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.run("key", compute))) for _ in range(7)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False)] + [("result", True)] * 7
+    # nothing is kept once done
+    assert flight.run("key", lambda: "again") == ("again", False)
+
+
+def test_single_flight_shares_the_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flight.run("key", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 4
+    assert len({id(e) for e in errors}) == 1
+
+
+def test_workers_sharing_the_disk_compute_a_missed_entry_once(tmp_path):
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def create_chart(filter_spec, structure):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"figure": 1}, structure
+
+    workers = [FigureCache(str(tmp_path), version="a") for _ in range(2)]
+    charts = [worker.memoize()(create_chart) for worker in workers]
+    first = threading.Thread(target=lambda: results.append(charts[0](SPEC, None)))
+    first.start()
+    started.wait(5)
+    # the second worker waits on the lock file of the entry, then reads it from disk
+    second = threading.Thread(target=lambda: results.append(charts[1](SPEC, None)))
+    second.start()
+    time.sleep(0.2)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert len(calls) == 1
+    assert results == [({"figure": 1}, None)] * 2
+    assert workers[1].stats()["callbacks"]["create_chart"]["coalesced"] == 1
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.cube import CUBE_MEASURES, DataCube
+
+CONDITIONS = [
+    {},
+    {"Fulfilment": "Amazon"},
+    {"is_promotion": True, "Status": ["Shipped", "Shipped - Delivered to Buyer"]},
+    {"state": "Maharashtra", "Category": ["Set", "Kurta"]},
+    {"Status": []},
+]
+
+
+@pytest.fixture(scope="module")
+def cubes(sales_data, preprocessed_data):
+    return {"year_month": (preprocessed_data["cubes"]["Monthly"], preprocessed_data["month_labels"]),
+            "year_week": (preprocessed_data["cubes"]["Weekly"], preprocessed_data["week_labels"])}
+
+
+def select(df, time_column, periods, conditions):
+    mask = df[time_column].isin(periods)
+    for column, accepted in conditions.items():
+        accepted = accepted if isinstance(accepted, list) else [accepted]
+        mask &= df[column].isin(accepted)
+    return df[mask]
+
+
+def ranges(labels):
+    last = len(labels) - 1
+    return [(0, last), (0, 0), (last, last), (1, max(last - 1, 1))]
+
+
+@pytest.mark.parametrize("time_column", ["year_month", "year_week"])
+@pytest.mark.parametrize("conditions", CONDITIONS)
+def test_totals_match_pandas(sales_data, cubes, time_column, conditions):
+    cube, labels = cubes[time_column]
+    for start, end in ranges(labels):
+        rows = select(sales_data, time_column, [labels[i] for i in range(start, end + 1)], conditions)
+
+        totals = cube.totals(start, end, conditions)
+
+        assert totals == pytest.approx({measure: rows[measure].sum() for measure in CUBE_MEASURES})
+
+
+@pytest.mark.parametrize("by", ["state", "Category", "Status", "is_promotion"])
+@pytest.mark.parametrize("conditions", CONDITIONS)
+def test_rollup_matches_pandas(sales_data, cubes, by, conditions):
+    cube, labels = cubes["year_week"]
+    for start, end in ranges(labels):
+        rows = select(sales_data, "year_week", [labels[i] for i in range(start, end + 1)], conditions)
+        expected = rows.groupby(by, observed=True)[CUBE_MEASURES].sum()
+
+        rollup = cube.rollup(start, end, by, conditions)
+
+        # every value of the dimension is listed, those without sales at 0
+        assert list(rollup.index) == sorted(sales_data[by].dropna().unique())
+        pd.testing.assert_frame_equal(rollup.reindex(expected.index), expected,
+                                      check_dtype=False, check_index_type=False, check_categorical=False)
+        assert (rollup[~rollup.index.isin(expected.index)] == 0).all().all()
+
+
+@pytest.mark.parametrize("time_column", ["year_month", "year_week"])
+@pytest.mark.parametrize("conditions", CONDITIONS)
+@pytest.mark.parametrize("by", [None, "Status"])
+def test_series_matches_pandas(sales_data, cubes, time_column, conditions, by):
+    cube, labels = cubes[time_column]
+    for start, end in ranges(labels):
+        periods = [labels[i] for i in range(start, end + 1)]
+        rows = select(sales_data, time_column, periods, conditions)
+        keys = [time_column] + ([by] if by else [])
+        expected = rows.groupby(keys, observed=True)[CUBE_MEASURES].sum()
+        expected.index = expected.index.set_levels([level.astype(object) for level in expected.index.levels]) \
+            if by else expected.index.astype(object)
+
+        series = cube.series(start, end, conditions, by=by)
+
+        observed_periods = series.index.get_level_values(0).unique() if by else series.index
+        assert list(observed_periods) == periods
+        series = series[(series != 0).any(axis=1)]
+        expected = expected[(expected != 0).any(axis=1)]
+        pd.testing.assert_frame_equal(series.sort_index(), expected.sort_index(), check_dtype=False,
+                                      check_index_type=False, check_names=False)
+
+
+def test_extended_matches_rebuilt_cube(sales_data, preprocessed_data):
+    months = list(preprocessed_data["month_labels"].values())
+    old = sales_data[sales_data["year_month"] != months[-1]]
+    new = sales_data[sales_data["year_month"] == months[-1]]
+
+    extended = DataCube(old, "year_month", months[:-1]).extended(new, months)
+    rebuilt = DataCube(sales_data, "year_month", months)
+
+    for conditions in CONDITIONS:
+        assert extended.totals(0, len(months) - 1, conditions) == \
+            pytest.approx(rebuilt.totals(0, len(months) - 1, conditions))
+        pd.testing.assert_frame_equal(extended.rollup(1, len(months) - 1, "state", conditions),
+                                      rebuilt.rollup(1, len(months) - 1, "state", conditions))
+    np.testing.assert_allclose(extended.series(0, len(months) - 1)["Amount"],
+                               rebuilt.series(0, len(months) - 1)["Amount"])
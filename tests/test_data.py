@@ -0,0 +1,27 @@
+import os
+import shutil
+import pandas as pd
+from src.data import DATA_PATH, dataset_version
+
+
+def test_dataset_version_keeps_a_copy_and_changes_with_the_content(tmp_path):
+    copy = tmp_path / "copy.parquet"
+    shutil.copy(DATA_PATH, copy)
+    os.utime(copy, (0, 0))
+    changed = tmp_path / "changed.parquet"
+    df = pd.read_parquet(DATA_PATH)
+    df.loc[0, "Qty"] = df["Qty"].max() + 1
+    df.to_parquet(changed)
+
+    assert dataset_version(str(copy)) == dataset_version(DATA_PATH)
+    assert dataset_version(str(changed)) != dataset_version(DATA_PATH)
+
+
+def test_dataset_version_of_other_files_follows_their_modification(tmp_path):
+    batch = tmp_path / "batch.csv"
+    batch.write_text("year_month,Amount\n2022-07,1.0\n")
+    version = dataset_version(str(batch))
+
+    os.utime(batch, ns=(0, 1))
+
+    assert dataset_version(str(batch)) != version
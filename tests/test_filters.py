@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+from src.data import STATUS_MAPPING
+from src.filters import FilterSpec
+
+
+def test_equivalent_selections_are_canonicalized():
+    spec = FilterSpec("Monthly", "1", 2.0, 1, "Both", ["Shipped", "Cancelled", "Shipped"], "")
+
+    assert spec == FilterSpec("Monthly", 1, 2, True, "Both", ("Cancelled", "Shipped"), None)
+    assert spec.to_dict() == {"granularity": "Monthly", "start": 1, "end": 2, "promo": True,
+                              "fulfilment": "Both", "statuses": ["Cancelled", "Shipped"], "state": None}
+    assert hash(spec) == hash(FilterSpec("Monthly", 1, 2, True, statuses=("Shipped", "Cancelled")))
+
+
+def test_round_trip_through_json():
+    spec = FilterSpec("Weekly", 2, 9, True, "Amazon", ("Shipped", "Cancelled"), "Kerala")
+
+    restored = FilterSpec.from_dict(json.loads(json.dumps(spec.to_dict())))
+
+    assert restored == spec
+    assert restored.key == spec.key
+    # fields added by a newer client are ignored
+    assert FilterSpec.from_dict({**spec.to_dict(), "unknown": 1}) == spec
+
+
+def test_key_is_stable_across_processes_and_releases():
+    spec = FilterSpec("Weekly", 2, 9, True, "Amazon", ("Shipped", "Cancelled"), "Kerala")
+    code = ("from src.filters import FilterSpec; "
+            "print(FilterSpec('Weekly', 2, 9, True, 'Amazon', ['Cancelled', 'Shipped'], 'Kerala').key)")
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    other_process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                   cwd=root, env={**os.environ, "PYTHONHASHSEED": "123"})
+
+    assert other_process.stdout.strip() == spec.key
+    # cached artifacts on disk are keyed by it, a change must be deliberate
+    assert spec.key == "114f287d61bf90ced95757fbf3da5c5977900d24"
+    assert FilterSpec().key == "f5a3390e9fc284c5a12b7297fe6080147c180b50"
+
+
+def test_keys_differ_between_selections():
+    specs = [FilterSpec(), FilterSpec(end=1), FilterSpec("Weekly"), FilterSpec(promo=True),
+             FilterSpec(fulfilment="Amazon"), FilterSpec(statuses=("Shipped",)), FilterSpec(state="Kerala")]
+
+    assert len({spec.key for spec in specs}) == len(specs)
+
+
+def test_without_relaxes_dimensions():
+    spec = FilterSpec("Monthly", 0, 2, True, "Amazon", ("Pending",), "Kerala")
+
+    relaxed = spec.without("state", "promo")
+
+    assert relaxed == FilterSpec("Monthly", 0, 2, False, "Amazon", ("Pending",), None)
+    assert relaxed.dimension_conditions(STATUS_MAPPING) == {"Fulfilment": "Amazon",
+                                                            "Status": STATUS_MAPPING["Pending"]}
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.data import DATA_PATH, SALES_SCHEMA, apply_schema, preprocess_data
+from src.filters import FilterSpec
+from src.ingest import BatchWatcher, LiveData, append_batch, build_snapshot, read_batch
+from src.store import SalesStore
+
+MOM_FIELDS = ["total_revenue_current", "revenue_mom_change", "total_quantity_current",
+              "quantity_mom_change", "completion_rate_current", "completion_rate_mom_change"]
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return pd.read_parquet(DATA_PATH)
+
+
+def next_month(rows):
+    # the rows of a month moved 4 weeks on, into a new month and new weeks
+    batch = rows.copy()
+    batch["year_month"] = "2022-07"
+    week_start = pd.to_datetime(batch["year_week"].str[:10]) + pd.Timedelta(days=28)
+    batch["year_week"] = (week_start.dt.strftime("%Y-%m-%d") + "/"
+                          + (week_start + pd.Timedelta(days=6)).dt.strftime("%Y-%m-%d"))
+    return batch
+
+
+def snapshot_of(rows, version):
+    df = apply_schema(rows)
+    return build_snapshot(df, preprocess_data(df), version)
+
+
+def specs_of(snapshot):
+    last_month, last_week = len(snapshot.month_labels) - 1, len(snapshot.week_labels) - 1
+    return [FilterSpec("Monthly", 0, last_month), FilterSpec("Monthly", last_month - 1, last_month, promo=True),
+            FilterSpec("Weekly", 0, last_week, statuses=("Shipped",)), FilterSpec("Weekly", 2, 6, state="Kerala"),
+            FilterSpec("Monthly", 0, last_month, fulfilment="Merchant", statuses=("Cancelled", "Pending"))]
+
+
+def assert_same_results(snapshot, reference):
+    assert snapshot.month_labels == reference.month_labels
+    assert snapshot.week_labels == reference.week_labels
+    for name in MOM_FIELDS:
+        assert snapshot.preprocessed_data[name] == pytest.approx(reference.preprocessed_data[name]), name
+    for spec in specs_of(reference):
+        result, expected = snapshot.queries.run(spec), reference.queries.run(spec)
+        assert result.totals == pytest.approx(expected.totals)
+        for rollup in ["by_period", "by_state", "by_category", "by_status"]:
+            pd.testing.assert_frame_equal(getattr(result, rollup), getattr(expected, rollup),
+                                          check_dtype=False, check_index_type=False)
+        assert result.kpis["revenue"] == pytest.approx(expected.kpis["revenue"])
+        assert result.kpis["completion_rate"] == pytest.approx(expected.kpis["completion_rate"])
+
+
+def test_new_month_matches_full_reload(raw):
+    batch = next_month(raw[raw["year_month"] == "2022-06"])
+    snapshot = snapshot_of(raw, "base")
+
+    appended = append_batch(snapshot, apply_schema(batch), "2022-07.parquet", "v1")
+
+    assert_same_results(appended, snapshot_of(pd.concat([raw, batch], ignore_index=True), "full"))
+    assert appended.batches == ("2022-07.parquet",)
+    assert appended.version != snapshot.version
+    # the served snapshot is left unchanged
+    assert len(snapshot.month_labels) == 3
+
+
+def test_late_rows_of_known_periods_match_full_reload(raw):
+    rng = np.random.default_rng(0)
+    batch = raw.iloc[rng.choice(len(raw), 500, replace=False)].copy()
+    batch["Amount"] = batch["Amount"] * 0.5
+    first = snapshot_of(raw, "base")
+
+    appended = append_batch(append_batch(first, apply_schema(batch.iloc[:250]), "a.csv", "v1"),
+                            apply_schema(batch.iloc[250:]), "b.csv", "v2")
+
+    assert_same_results(appended, snapshot_of(pd.concat([raw, batch], ignore_index=True), "full"))
+    assert appended.batches == ("a.csv", "b.csv")
+
+
+def test_live_data_ingests_batch_files_in_order(raw, tmp_path):
+    next_rows = next_month(raw[raw["year_month"] == "2022-06"])
+    next_rows.iloc[:100].to_csv(tmp_path / "1.csv", index=False)
+    next_rows.iloc[100:].to_parquet(tmp_path / "2.parquet")
+    next_rows.drop(columns="Amount").to_parquet(tmp_path / "3.parquet")
+    live_data = LiveData(snapshot_of(raw, "base"))
+    swapped = []
+    live_data.on_swap(swapped.append)
+
+    n_batches = live_data.ingest([str(tmp_path / name) for name in ["1.csv", "2.parquet", "3.parquet"]])
+
+    # the batch without Amount is skipped, the others are swapped in at once
+    assert n_batches == 2
+    assert swapped == [live_data.current]
+    assert live_data.current.batches == ("1.csv", "2.parquet")
+    assert_same_results(live_data.current, snapshot_of(pd.concat([raw, next_rows], ignore_index=True), "full"))
+
+
+def test_watcher_skips_ingested_unsettled_and_other_files(raw, tmp_path):
+    next_rows = next_month(raw[raw["year_month"] == "2022-06"])
+    for name in ["a.parquet", "b.parquet", ".c.parquet"]:
+        next_rows.to_parquet(tmp_path / name)
+    (tmp_path / "notes.txt").write_text("")
+    snapshot = snapshot_of(raw, "base")
+    live_data = LiveData(append_batch(snapshot, apply_schema(next_rows), "a.parquet", "v1"))
+
+    assert BatchWatcher(str(tmp_path), live_data, settle=0).pending() == [str(tmp_path / "b.parquet")]
+    assert BatchWatcher(str(tmp_path), live_data, settle=3600).pending() == []
+
+
+def test_read_batch_keeps_the_schema_columns(raw, tmp_path):
+    raw.assign(extra=1).to_csv(tmp_path / "batch.csv", index=False)
+
+    assert list(read_batch(str(tmp_path / "batch.csv")).columns) == list(SALES_SCHEMA)
+
+
+def test_batch_on_recent_months_matches_full_reload(raw, tmp_path):
+    raw.to_parquet(tmp_path / "dataset", partition_cols=["year_month"])
+    store = SalesStore(str(tmp_path / "dataset"), 2)
+    df, preprocessed_data, backend = store.load()
+    snapshot = build_snapshot(df, preprocessed_data, "hot", store.states, backend=backend)
+    batch = next_month(raw[raw["year_month"] == "2022-06"])
+
+    # appended before any query reads the older months
+    appended = append_batch(snapshot, apply_schema(batch), "2022-07.parquet", "v1")
+
+    assert_same_results(appended, snapshot_of(pd.concat([raw, batch], ignore_index=True), "full"))
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+from src.backends import CubeBackend
+from src.filters import FilterSpec
+from src.kpis import compute_kpis, compute_kpis_batch
+from src.query import QueryEngine
+
+
+def make_engine(preprocessed_data):
+    return QueryEngine(CubeBackend(preprocessed_data["cubes"]), preprocessed_data["month_labels"],
+                       preprocessed_data["week_labels"], preprocessed_data["status_mapping"], version="test")
+
+
+def assert_same_kpis(batch, single):
+    pd.testing.assert_frame_equal(batch["by_period"], single["by_period"])
+    for name in ["revenue", "quantity", "completion_rate"]:
+        assert batch[name] == pytest.approx(single[name]), name
+
+
+def test_batch_matches_each_range(sales_data, preprocessed_data):
+    periods = list(preprocessed_data["week_labels"].values())
+    ranges = [(0, len(periods) - 1), (0, 0), (2, 5), (len(periods) - 3, len(periods) - 1)]
+
+    batch = compute_kpis_batch(sales_data, "year_week", periods, ranges, "Weekly")
+
+    for (first, last), kpis in zip(ranges, batch):
+        single = compute_kpis(sales_data, "year_week", periods[first:last + 1], "Weekly")
+        assert_same_kpis(kpis, single)
+
+
+def test_run_many_matches_run(preprocessed_data):
+    last_month = len(preprocessed_data["month_labels"]) - 1
+    last_week = len(preprocessed_data["week_labels"]) - 1
+    specs = [
+        FilterSpec("Monthly", 0, last_month),
+        FilterSpec("Monthly", 1, last_month),
+        FilterSpec("Monthly", 0, last_month, promo=True, statuses=("Shipped",)),
+        FilterSpec("Weekly", 0, last_week, fulfilment="Amazon"),
+        FilterSpec("Weekly", 3, 6, fulfilment="Amazon"),
+        FilterSpec("Weekly", 3, 6, state="Maharashtra"),
+        FilterSpec("Monthly", 0, last_month),
+    ]
+
+    batch = make_engine(preprocessed_data).run_many(specs)
+    single_engine = make_engine(preprocessed_data)
+
+    assert [result.spec for result in batch] == specs
+    assert batch[0] is batch[-1]
+    for result in batch:
+        single = single_engine.run(result.spec)
+        assert_same_kpis(result.kpis, single.kpis)
+        assert result.totals == pytest.approx(single.totals)
+        pd.testing.assert_frame_equal(result.by_period, single.by_period)
+        pd.testing.assert_frame_equal(result.by_state, single.by_state)
+
+
+def test_run_many_keeps_results(preprocessed_data):
+    engine = make_engine(preprocessed_data)
+    spec = FilterSpec("Monthly", 0, len(preprocessed_data["month_labels"]) - 1)
+
+    [result] = engine.run_many([spec])
+
+    assert engine.run(spec) is result
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+from src.backends import CubeBackend
+from src.data import DATA_PATH
+from src.store import SalesStore
+
+
+@pytest.fixture(scope="module")
+def partitioned_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("sales") / "dataset"
+    pd.read_parquet(DATA_PATH).to_parquet(path, partition_cols=["year_month"])
+    return str(path)
+
+
+def test_recent_months_answer_without_reading_the_older_ones(partitioned_path, preprocessed_data):
+    store = SalesStore(partitioned_path, 2)
+    _, _, backend = store.load()
+    full = CubeBackend(preprocessed_data["cubes"])
+    last_month = len(store.months) - 1
+
+    pd.testing.assert_frame_equal(backend.series("Monthly", 1, last_month, {}),
+                                  full.series("Monthly", 1, last_month, {}))
+    assert backend.store is store
+
+
+@pytest.mark.parametrize("granularity", ["Monthly", "Weekly"])
+def test_older_periods_are_read_before_answering(partitioned_path, preprocessed_data, granularity):
+    store = SalesStore(partitioned_path, 2)
+    _, loaded, backend = store.load()
+    full = CubeBackend(preprocessed_data["cubes"])
+    labels = loaded["month_labels"] if granularity == "Monthly" else loaded["week_labels"]
+    last = len(labels) - 1
+
+    assert backend.totals(granularity, 0, last, {}) == pytest.approx(full.totals(granularity, 0, last, {}))
+    assert backend.store is None
+    pd.testing.assert_frame_equal(backend.rollup(granularity, 0, last, "state", {}),
+                                  full.rollup(granularity, 0, last, "state", {}))
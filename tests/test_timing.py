@@ -0,0 +1,35 @@
+import json
+from types import SimpleNamespace
+import flask
+from src.timing import CallbackTimings, instrument
+from src.trace import record_traces
+
+
+def create_sales_chart(filter_spec):
+    return filter_spec
+
+
+def make_app():
+    server = flask.Flask(__name__)
+    server.add_url_rule('/_dash-update-component', 'update', lambda: {"response": {}}, methods=['POST'])
+    return SimpleNamespace(server=server, callback_map={"sales.figure": {"callback": create_sales_chart}})
+
+
+def test_background_polls_are_neither_timed_nor_traced(tmp_path):
+    app = make_app()
+    timings = CallbackTimings()
+    trace_path = tmp_path / "trace.jsonl"
+    instrument(app, timings)
+    record_traces(app, str(trace_path))
+    client = app.server.test_client()
+    body = {"output": "sales.figure", "inputs": [{"value": {"granularity": "Monthly"}}]}
+
+    started = client.post('/_dash-update-component', json=body)
+    for _ in range(3):
+        poll = client.post('/_dash-update-component?cacheKey=abc&job=123', json=body)
+        assert 'Server-Timing' not in poll.headers
+
+    assert 'Server-Timing' in started.headers
+    assert timings.summary()["create_sales_chart"]["requests"] == 1
+    lines = trace_path.read_text().splitlines()
+    assert [json.loads(line)["cb"] for line in lines] == ["create_sales_chart"]
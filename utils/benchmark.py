@@ -0,0 +1,216 @@
+"""
+This script benchmarks the dashboard on synthetic sales data of growing sizes. It
+is not part of the Dash dashboard files; run it to size the hardware of a
+deployment and to catch scaling regressions before they reach production.
+
+For every size, data is generated with utils/generate_sales_data.py and a fresh
+process measures the latency and peak Python memory of loading the data,
+`preprocess_data`, the app startup and each data callback (query, figure and JSON
+serialization, without the figure cache) on common filter states, plus the size
+of the responses and the peak resident memory of the process. The DASHBOARD_*
+environment variables are passed on, e.g. DASHBOARD_BACKEND=duckdb.
+
+Usage: python utils/benchmark.py [--rows 10000,100000,1000000] [--months 12] [--states 36]
+       [--categories 9] [--skew 1.0] [--repeat 5] [--output report.csv]
+       [--compare baseline.csv] [--tolerance 1.5]
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+# Time a function and measure the peak memory it allocates
+def measure(function, repeat):
+    """
+    Run a function `repeat` times for its latency, then once more traced for its memory.
+
+    Args:
+        function (callable): Function without arguments.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: Median and max latency in ms, peak allocated memory in MB and the
+            result of the last run under "result".
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    # tracing slows Python code down, so it is kept out of the timed runs
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'median_ms': pd.Series(latencies).median(),
+        'max_ms': max(latencies),
+        'peak_mb': peak / 1024 ** 2,
+        'result': result
+    }
+
+# Measurements of one data size, run in a fresh process
+def run_child(data_path, repeat):
+    """
+    Measure the stages of the dashboard on one data file and print them as JSON lines.
+
+    Args:
+        data_path (str): File path to the generated sales data.
+        repeat (int): Number of timed runs of every stage.
+    """
+    sys.path.insert(0, os.getcwd())
+    os.environ['DASHBOARD_DATA'] = data_path
+    os.environ['DASHBOARD_WARMUP'] = '0'
+    os.environ.pop('DASHBOARD_INBOX', None)
+    os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(os.path.dirname(data_path), 'cache')
+    from plotly.io.json import to_json_plotly
+    from src.data import import_data, preprocess_data
+
+    def report(stage, scenario, measured, response_bytes=None):
+        measured.pop('result')
+        print(json.dumps({'stage': stage, 'scenario': scenario, **measured, 'response_bytes': response_bytes}),
+              flush=True)
+
+    report('load', '', measure(lambda: import_data(data_path), repeat))
+    df = import_data(data_path)
+    report('preprocess_data', '', measure(lambda: preprocess_data(df), repeat))
+    del df
+
+    # the app is imported once, its startup loads and preprocesses the data again
+    start = time.perf_counter()
+    from src import app, callbacks
+    from src.filters import FilterSpec
+    print(json.dumps({'stage': 'app_startup', 'scenario': '', 'median_ms': (time.perf_counter() - start) * 1000}),
+          flush=True)
+
+    snapshot = app.live_data.current
+    last_month, last_week = len(snapshot.month_labels) - 1, len(snapshot.week_labels) - 1
+    scenarios = {
+        'all_months': FilterSpec("Monthly", 0, last_month, statuses=["Shipped"]),
+        'last_month': FilterSpec("Monthly", last_month, last_month, statuses=list(snapshot.status_mapping)),
+        'last_4_weeks': FilterSpec("Weekly", max(0, last_week - 3), last_week, statuses=["Shipped"]),
+        'one_state': FilterSpec("Monthly", 0, last_month, fulfilment="Amazon", statuses=["Shipped"],
+                                state=snapshot.map_states[0])
+    }
+    chart_callbacks = {
+        'create_map': callbacks.create_map.__wrapped__,
+        'create_sales_chart': callbacks.create_sales_chart.__wrapped__,
+        'create_product_chart': callbacks.create_product_chart.__wrapped__
+    }
+    for scenario, spec in scenarios.items():
+        filter_spec = spec.to_dict()
+
+        def metrics():
+            # from scratch every time: the query results are shared by the callbacks of a filter change
+            snapshot.queries.clear()
+            return to_json_plotly(callbacks.update_metrics(filter_spec))
+        measured = measure(metrics, repeat)
+        report('update_metrics', scenario, measured, len(measured['result']))
+
+        for name, chart_callback in chart_callbacks.items():
+            # first render of the chart, then an update of the chart now in the browser
+            structure = chart_callback(filter_spec, None)[-1]
+            for render, structure_in_browser in [('first', None), ('update', structure)]:
+                def chart():
+                    snapshot.queries.clear()
+                    return to_json_plotly(chart_callback(filter_spec, structure_in_browser))
+                measured = measure(chart, repeat)
+                report(f"{name} ({render})", scenario, measured, len(measured['result']))
+
+    # peak resident memory of the process, in KB on Linux
+    print(json.dumps({'stage': 'process', 'scenario': '', 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}),
+          flush=True)
+
+# Benchmark every size in its own process
+def run_sizes(args):
+    """
+    Generate the data of every size and collect the measurements of its process.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line arguments.
+
+    Returns:
+        pd.DataFrame: One row per size, stage and scenario.
+    """
+    from generate_sales_data import generate_sales_data  # next to this script
+
+    results = []
+    for rows in [int(rows) for rows in args.rows.split(',')]:
+        directory = tempfile.mkdtemp(prefix='dashboard-benchmark-')
+        try:
+            df = generate_sales_data(rows, args.months, states=args.states, categories=args.categories, skew=args.skew)
+            data_path = os.path.join(directory, 'sales.parquet')
+            df.to_parquet(data_path, index=False)
+            print(f"{rows:,} rows drawn, {len(df):,} rows of sales data", flush=True)
+            n_rows = len(df)
+            del df
+
+            child = subprocess.run([sys.executable, __file__, '--child', data_path, '--repeat', str(args.repeat)],
+                                   capture_output=True, text=True)
+            if child.returncode != 0:
+                sys.exit(child.stderr)
+            for line in child.stdout.splitlines():
+                if line.startswith('{'):
+                    results.append({'rows': rows, 'data_rows': n_rows, **json.loads(line)})
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return pd.DataFrame(results)
+
+# Compare the report to a baseline
+def compare(report, baseline, tolerance):
+    """
+    Find the stages whose median latency grew beyond the tolerance.
+
+    Args:
+        report (pd.DataFrame): Current report.
+        baseline (pd.DataFrame): Report of a previous run with the same sizes.
+        tolerance (float): Allowed ratio of the current to the baseline latency.
+
+    Returns:
+        pd.DataFrame: The regressed stages, with both latencies and their ratio.
+    """
+    keys = ['rows', 'stage', 'scenario']
+    merged = report.merge(baseline[keys + ['median_ms']], on=keys, suffixes=('', '_baseline'))
+    merged['ratio'] = merged['median_ms'] / merged['median_ms_baseline']
+    return merged[merged['ratio'] > tolerance][keys + ['median_ms_baseline', 'median_ms', 'ratio']]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scale benchmark of the dashboard on synthetic data")
+    parser.add_argument('--rows', default='10000,100000,1000000', help="comma-separated numbers of rows to draw")
+    parser.add_argument('--months', type=int, default=12, help="number of months")
+    parser.add_argument('--states', type=int, default=36, help="number of states")
+    parser.add_argument('--categories', type=int, default=9, help="number of categories")
+    parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent of states and categories")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs of every stage")
+    parser.add_argument('--output', help="write the report to this CSV file")
+    parser.add_argument('--compare', help="fail if a stage is slower than in this baseline report")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="allowed slowdown over the baseline")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.repeat)
+        sys.exit()
+
+    report = run_sizes(args)
+    pd.set_option('display.width', 200)
+    print(report.pivot_table(index=['stage', 'scenario'], columns='data_rows', values='median_ms', sort=False)
+          .round(1).to_string())
+    print(report[report['stage'] == 'process'][['rows', 'data_rows', 'peak_rss_mb']].to_string(index=False))
+    if args.output:
+        report.to_csv(args.output, index=False)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        regressions = compare(report, pd.read_csv(args.compare).fillna({'scenario': ''}), args.tolerance)
+        if not regressions.empty:
+            print(regressions.round(2).to_string(index=False))
+            sys.exit(f"{len(regressions)} stages are more than {args.tolerance}x slower than the baseline")
+        print(f"No stage is more than {args.tolerance}x slower than the baseline")
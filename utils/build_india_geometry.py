@@ -0,0 +1,124 @@
+"""
+This script builds the simplified India state boundaries bundled with the dashboard
+in data/geo/. It is not part of the Dash dashboard files and only needs to be
+re-run when the source boundaries change; the dashboard only reads its output.
+
+Two sources are accepted:
+- the Natural Earth admin-1 shapefile (a path or URL of the zip), which needs
+  geopandas (`pip install geopandas`), not needed by the dashboard itself;
+- the India map of the echarts-countries-pypkg package (MIT licensed), the
+  `echarts_countries_pypkg/resources/echarts-countries-js/India.js` file of its
+  sdist, which only needs shapely. The bundled files are built from it.
+
+State names are renamed to those of utils/clean_raw_data.py, so the map matches the sales data.
+
+Usage: python utils/build_india_geometry.py [path or URL of ne_50m_admin_1_states_provinces.zip, or path of India.js]
+"""
+
+import json
+import os
+import sys
+import shapely
+
+source = sys.argv[1] if len(sys.argv) > 1 else \
+    'https://naciscdn.org/naturalearth/50m/cultural/ne_50m_admin_1_states_provinces.zip'
+output_path = 'data/geo/'
+
+# simplification tolerance in degrees for each detail level
+detail_levels = {'high': 0.005, 'medium': 0.02, 'low': 0.05}
+# coordinates are snapped to this grid (~10 m), which also shortens the file
+grid_size = 0.0001
+
+# Source state names to the names of the cleaned sales data
+state_names = {
+    'Andaman and Nicobar Islands': 'Andaman and Nicobar',
+    'Dadra and Nagar Haveli': 'Dadra and Nagar Haveli and Daman and Diu',
+    'Pondicherry': 'Puducherry',
+    'Orissa': 'Odisha'
+}
+
+# Decode a ring of an echarts map
+def decode_ring(encoded, offset, scale=1024):
+    """
+    Decode a ring of a map in the compressed format of echarts (UTF8Encoding).
+
+    Args:
+        encoded (str): Characters of the zigzag-encoded coordinate deltas.
+        offset (list): Encoded coordinates of the first point.
+        scale (int): Number of encoded units per degree.
+
+    Returns:
+        list: [longitude, latitude] of every point.
+    """
+    x, y = offset
+    points = []
+    for i in range(0, len(encoded), 2):
+        dx, dy = ord(encoded[i]) - 64, ord(encoded[i + 1]) - 64
+        x += (dx >> 1) ^ -(dx & 1)
+        y += (dy >> 1) ^ -(dy & 1)
+        points.append([x / scale, y / scale])
+    return points
+
+# States and geometry of an echarts map file
+def read_echarts_map(path):
+    """
+    Read the states of an echarts map registered by a JavaScript file.
+
+    Args:
+        path (str): File path of the map, e.g. India.js.
+
+    Returns:
+        tuple: State names (list) and their geometries (np.ndarray).
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    collection, _ = json.JSONDecoder().raw_decode(text, text.index('{"type":"FeatureCollection"'))
+
+    states, geometry = [], []
+    for feature in collection['features']:
+        shape = feature['geometry']
+        polygons = shape['coordinates'] if shape['type'] == 'MultiPolygon' else [shape['coordinates']]
+        offsets = shape['encodeOffsets'] if shape['type'] == 'MultiPolygon' else [shape['encodeOffsets']]
+        rings = [[decode_ring(ring, offset) for ring, offset in zip(polygon, polygon_offsets)]
+                 for polygon, polygon_offsets in zip(polygons, offsets)]
+        states.append(feature['properties']['name'])
+        geometry.append(shapely.geometry.shape({'type': 'MultiPolygon', 'coordinates': rings}))
+    return states, shapely.make_valid(geometry)
+
+# States and geometry of the Natural Earth admin-1 boundaries
+def read_natural_earth(source):
+    """
+    Read the Indian states of the Natural Earth admin-1 shapefile.
+
+    Args:
+        source (str): Path or URL of the zipped shapefile.
+
+    Returns:
+        tuple: State names (list) and their geometries (np.ndarray).
+    """
+    import geopandas as gpd  # only needed for this source
+
+    india = gpd.read_file(source).query("iso_a2 == 'IN'")
+    return india['name'].tolist(), india.geometry.values
+
+states, geometry = read_echarts_map(source) if source.endswith('.js') else read_natural_earth(source)
+states = [state_names.get(state, state) for state in states]
+
+os.makedirs(output_path, exist_ok=True)
+for level, tolerance in detail_levels.items():
+    if hasattr(shapely, 'coverage_simplify'):
+        # simplify the states as one coverage so neighbours keep sharing the same border
+        simplified = shapely.coverage_simplify(geometry, tolerance)
+    else:
+        simplified = shapely.simplify(geometry, tolerance, preserve_topology=True)
+    # shared vertices snap to the same grid point, so borders still match
+    simplified = shapely.set_precision(simplified, grid_size)
+
+    features = [
+        {"type": "Feature", "properties": {"state": state}, "geometry": shapely.geometry.mapping(shape)}
+        for state, shape in zip(states, simplified)
+    ]
+    file_path = os.path.join(output_path, f'india_states_{level}.geojson')
+    with open(file_path, 'w') as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, separators=(',', ':'))
+    print(f"{file_path}: {os.path.getsize(file_path) / 1024:.0f} KB")
@@ -1,31 +1,39 @@
 """
 This script pre-processes the original raw file from Kaggle and prepares it to be used
 in the dashboard. It is not part of the Dash dashboard files
-"""
 
-import pandas as pd
-import os
+The raw export is read in chunks; each chunk is cleaned and summarized in a pool
+of worker processes and the partial summaries are merged as they come in, so the
+memory used depends on the chunk size and the number of workers, not on the size
+of the export.
 
-# read the raw zipped data that was downloaded from Kaggle
-data_path = 'data/raw/'
-file_path = os.path.join(data_path, 'Amazon_Sale_Report.zip')
+With --partitioned the summary is written as a parquet dataset with one directory
+per month (year_month=2022-04/...), sorted by week so the row-group statistics let
+readers skip the rows of other weeks; see `src/store.py`.
 
-df = pd.read_csv(file_path, index_col = 0, dtype = {23: str})
-df['Date'] = pd.to_datetime(df['Date'], format = '%m-%d-%y')
+Usage: python utils/clean_raw_data.py [--input data/raw/Amazon_Sale_Report.zip]
+       [--output data/processed/amazon_in_sales.parquet] [--chunksize 200000] [--workers 4]
+       [--partitioned] [--row-group-size 65536]
+"""
 
-df = df.iloc[:, :-1]  # Drop last column, not required
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 
-# create some derived columns
-df['is_promotion'] = df['promotion-ids'].notna() # will capture both NA and empty string
-df['year_month'] = df["Date"].dt.to_period("M").astype(str) # the month from date
-df['year_week'] = df["Date"].dt.to_period("W").astype(str) # the week from date
+# Raw columns used by the summary, the others are not read
+RAW_COLUMNS = ['Order ID', 'Date', 'Status', 'Fulfilment', 'Category', 'Qty', 'Amount',
+               'ship-state', 'promotion-ids']
 
-# pre-process the geolocation, state
-df.rename(columns={'ship-state': 'state'}, inplace=True)
-df['state'] = df['state'].str.title()
-df['state'].dropna(inplace=True)
-# pre-process Category
-df['Category'] = df['Category'].str.title()
+# Dimensions that will be queried/filtered in the dashboard
+GROUP_COLUMNS = ['year_month', 'year_week', 'Status', 'Fulfilment', 'Category', 'state', 'is_promotion']
+
+# Metrics that will be shown, summed when partial summaries are merged
+METRIC_COLUMNS = ['Qty', 'order_count', 'Amount']
 
 # Mapping to rename/clean state names in sales data
 state_mapping = {
@@ -36,19 +44,122 @@ state_mapping = {
     'Rj': 'Rajasthan'
 }
 
-df['state'] = df['state'].replace(state_mapping)
+# Clean and summarize one chunk of the raw data
+def summarize_chunk(df):
+    """
+    Clean a chunk of raw rows and summarize it along the dashboard dimensions.
+
+    Args:
+        df (pd.DataFrame): Raw rows, with the columns in RAW_COLUMNS.
+
+    Returns:
+        pd.DataFrame: Partial summary, one row per combination of GROUP_COLUMNS.
+    """
+    df['Date'] = pd.to_datetime(df['Date'], format = '%m-%d-%y')
+    # only use data from April 1. March data is very limited/incomplete
+    df = df[df['Date'] >= '2022-04-01'].copy()
+
+    # create some derived columns
+    df['is_promotion'] = df['promotion-ids'].notna() # will capture both NA and empty string
+    df['year_month'] = df["Date"].dt.to_period("M").astype(str) # the month from date
+    df['year_week'] = df["Date"].dt.to_period("W").astype(str) # the week from date
+
+    # pre-process the geolocation, state, and Category
+    df['state'] = df['ship-state'].str.title().replace(state_mapping)
+    df['Category'] = df['Category'].str.title()
+
+    return df.groupby(GROUP_COLUMNS).agg(
+        {'Qty': 'sum', 'Order ID': 'size', 'Amount': 'sum'}
+        ).rename(columns={'Order ID': 'order_count'})
+
+# Merge partial summaries
+def merge_summaries(summaries):
+    """
+    Merge partial summaries of disjoint sets of rows by summing their metrics.
+
+    Args:
+        summaries (list): Partial summaries from `summarize_chunk` or this function.
+
+    Returns:
+        pd.DataFrame: Summary of all the rows.
+    """
+    return pd.concat(summaries).groupby(level=GROUP_COLUMNS)[METRIC_COLUMNS].sum()
+
+# Stream the raw export through the worker pool
+def summarize_raw_data(file_path, chunksize, workers):
+    """
+    Summarize the raw export chunk by chunk in parallel.
+
+    Args:
+        file_path (str): File path to the raw CSV, optionally zipped.
+        chunksize (int): Number of raw rows per chunk.
+        workers (int): Number of worker processes.
+
+    Returns:
+        pd.DataFrame: Summary of the raw data, in the processed data layout.
+    """
+    reader = pd.read_csv(file_path, usecols = RAW_COLUMNS, chunksize = chunksize,
+                         dtype = {'promotion-ids': str, 'Order ID': str})
+    summary = None
+    pending = []
+    n_rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in reader:
+            n_rows += len(chunk)
+            pending.append(pool.submit(summarize_chunk, chunk))
+            # keep a bounded number of chunks in flight, folding finished ones into the summary
+            while len(pending) > 2 * workers:
+                partial = pending.pop(0).result()
+                summary = partial if summary is None else merge_summaries([summary, partial])
+        partials = [future.result() for future in pending]
+    summary = merge_summaries(([summary] if summary is not None else []) + partials)
+    print(f"Summarized {n_rows:,} raw rows to {len(summary):,} rows")
+    return summary.reset_index()
+
+# Write the summary as a dataset partitioned by month
+def write_partitioned(summarized_df, output, row_group_size):
+    """
+    Write the summary as a parquet dataset with one partition per month.
+
+    The dataset is written next to the output directory and swapped in once
+    complete, so months dropped from the export do not linger.
+
+    Args:
+        summarized_df (pd.DataFrame): Summary from `summarize_raw_data`.
+        output (str): Directory of the dataset.
+        row_group_size (int): Maximum number of rows per row group.
+    """
+    # rows sorted by week within a month, so the row groups cover narrow week ranges
+    table = pa.Table.from_pandas(summarized_df.sort_values(GROUP_COLUMNS, kind='stable'), preserve_index=False)
+    temp_output = f"{output}.tmp"
+    shutil.rmtree(temp_output, ignore_errors=True)
+    # fixed file names, so an unchanged summary keeps its dataset version
+    ds.write_dataset(table, temp_output, format='parquet', partitioning=['year_month'], partitioning_flavor='hive',
+                     basename_template='part-{i}.parquet', max_rows_per_group=row_group_size,
+                     min_rows_per_group=min(row_group_size, 1024), max_rows_per_file=16 * row_group_size)
+    shutil.rmtree(output, ignore_errors=True)
+    os.rename(temp_output, output)
 
-# summarize the data by grouping along the dimensions that will be queried/filtered
-# only use data from April 1. March data is very limited/incomplete
-summarized_df = df[df['Date']>='2022-04-01'].groupby(['year_month', 'year_week', 
-            'Status', 'Fulfilment', 'Category', 
-            'state', 'is_promotion',]).agg(
-                # and aggregate the metrics that will be shown
-                {'Qty': 'sum', 'Order ID': 'size', 'Amount': 'sum'}
-                ).reset_index()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Summarize the raw sales export for the dashboard")
+    # the raw zipped data that was downloaded from Kaggle
+    parser.add_argument('--input', default=os.path.join('data/raw/', 'Amazon_Sale_Report.zip'),
+                        help="raw CSV export, optionally zipped")
+    parser.add_argument('--output', default='data/processed/amazon_in_sales.parquet',
+                        help="summarized parquet file, or a batch file in the dashboard inbox")
+    parser.add_argument('--chunksize', type=int, default=200000, help="raw rows read at a time")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--partitioned', action='store_true',
+                        help="write a dataset partitioned by month to the --output directory")
+    parser.add_argument('--row-group-size', type=int, default=65536, help="maximum rows per row group")
+    args = parser.parse_args()
 
-# rename Order ID summary as order_count
-summarized_df.rename(columns={'Order ID': 'order_count'}, inplace=True)
+    start = time.perf_counter()
+    summarized_df = summarize_raw_data(args.input, args.chunksize, args.workers)
 
-# save to parquet file
-summarized_df.to_parquet('data/processed/amazon_in_sales.parquet', index=False)
\ No newline at end of file
+    # save to parquet file
+    if args.partitioned:
+        write_partitioned(summarized_df, args.output, args.row_group_size)
+    else:
+        summarized_df.to_parquet(args.output, index=False, row_group_size=args.row_group_size)
+    print(f"Wrote {args.output} in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,175 @@
+"""
+This script generates synthetic sales data with the schema of
+data/processed/amazon_in_sales.parquet, to test and benchmark the dashboard at sizes
+well beyond the Kaggle sample. It is not part of the Dash dashboard files.
+
+Rows are drawn independently: a day of the period (giving its month and week), a
+status and fulfilment with the frequencies of the Kaggle sample, and a state and
+category whose frequencies follow a Zipf law of exponent --skew (0 for uniform).
+Rows falling on the same dimensions are merged, as in the processed data.
+
+Usage: python utils/generate_sales_data.py --rows 1000000 [--months 12] [--start 2022-04]
+       [--states 36] [--categories 9] [--skew 1.0] [--seed 0]
+       [--output data/synthetic/amazon_in_sales.parquet] [--partitioned]
+"""
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Order statuses and their share of the orders in the Kaggle sample
+STATUS_WEIGHTS = {
+    'Shipped': 0.603, 'Shipped - Delivered to Buyer': 0.2232, 'Cancelled': 0.1422,
+    'Shipped - Returned to Seller': 0.0151, 'Shipped - Picked Up': 0.0076, 'Pending': 0.0051,
+    'Pending - Waiting for Pick Up': 0.0022, 'Shipped - Returning to Seller': 0.0011,
+    'Shipped - Out for Delivery': 0.0003, 'Shipped - Rejected by Buyer': 0.0001, 'Shipping': 0.0001,
+    'Shipped - Lost in Transit': 0.00005, 'Shipped - Damaged': 0.00005
+}
+
+# Share of the orders fulfilled by Amazon and with a promotion in the Kaggle sample
+AMAZON_SHARE = 0.695
+PROMOTION_SHARE = 0.619
+
+# States of the Kaggle sample, most orders first; extra states are numbered
+STATES = [
+    'Maharashtra', 'Karnataka', 'Tamil Nadu', 'Telangana', 'Uttar Pradesh', 'Delhi', 'Kerala',
+    'West Bengal', 'Andhra Pradesh', 'Gujarat', 'Haryana', 'Rajasthan', 'Madhya Pradesh', 'Odisha',
+    'Bihar', 'Punjab', 'Assam', 'Uttarakhand', 'Jharkhand', 'Goa', 'Chhattisgarh', 'Himachal Pradesh',
+    'Jammu and Kashmir', 'Puducherry', 'Chandigarh', 'Manipur', 'Andaman and Nicobar', 'Meghalaya',
+    'Sikkim', 'Nagaland', 'Tripura', 'Arunachal Pradesh', 'Mizoram',
+    'Dadra and Nagar Haveli and Daman and Diu', 'Ladakh', 'Lakshadweep'
+]
+
+# Categories of the Kaggle sample, most orders first, with their median order amount
+CATEGORY_PRICES = {
+    'Set': 776, 'Kurta': 424, 'Western Dress': 735, 'Top': 500, 'Ethnic Dress': 732,
+    'Blouse': 507, 'Bottom': 338, 'Saree': 782, 'Dupatta': 305
+}
+
+# Zipf weights of ranked values
+def zipf_weights(n, skew):
+    """
+    Probabilities of n ranked values following a Zipf law.
+
+    Args:
+        n (int): Number of values.
+        skew (float): Exponent of the law, 0 for uniform probabilities.
+
+    Returns:
+        np.ndarray: Probabilities, largest first.
+    """
+    weights = 1 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+# Names of n values, the known ones first
+def value_names(known, n, prefix):
+    """
+    Name n values, taking the known names first and numbering the others.
+
+    Args:
+        known (list): Known names, in order.
+        n (int): Number of values.
+        prefix (str): Prefix of the numbered names.
+
+    Returns:
+        list: Names of the values.
+    """
+    return [known[i] if i < len(known) else f"{prefix} {i + 1}" for i in range(n)]
+
+# Generate synthetic summarized sales rows
+def generate_sales_data(rows, months=3, start='2022-04', states=len(STATES), categories=len(CATEGORY_PRICES),
+                        skew=1.0, seed=0):
+    """
+    Generate synthetic sales data with the columns and types of the processed data.
+
+    Months are drawn one at a time and the dimensions are kept as integer codes
+    until the rows of a month are merged, so large sizes fit in memory.
+
+    Args:
+        rows (int): Number of rows to draw; fewer remain once merged, depending on
+            the number of distinct combinations of the dimensions.
+        months (int): Number of months, starting at `start`.
+        start (str): First month, e.g. "2022-04".
+        states (int): Number of states.
+        categories (int): Number of product categories.
+        skew (float): Zipf exponent of the state and category frequencies.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: Sales data, sorted like the output of utils/clean_raw_data.py.
+    """
+    rng = np.random.default_rng(seed)
+    names = {
+        'Status': list(STATUS_WEIGHTS),
+        'Fulfilment': ['Amazon', 'Merchant'],
+        'Category': value_names(list(CATEGORY_PRICES), categories, 'Category'),
+        'state': value_names(STATES, states, 'State')
+    }
+    status_weights = np.array(list(STATUS_WEIGHTS.values()))
+    status_weights /= status_weights.sum()
+    prices = np.array([CATEGORY_PRICES.get(name, 500) for name in names['Category']], dtype=float)
+    cancelled_code = names['Status'].index('Cancelled')
+
+    dimensions = ['year_month', 'year_week', 'Status', 'Fulfilment', 'Category', 'state', 'is_promotion']
+    frames = []
+    first_month = pd.Period(start, 'M')
+    for i in range(months):
+        month = first_month + i
+        n = rows // months + (i < rows % months)
+        days = pd.date_range(month.start_time, month.end_time.normalize(), freq='D')
+        weeks = days.to_period('W').astype(str)
+        day_ids = rng.integers(0, len(days), n)
+
+        codes = {
+            'Status': rng.choice(len(status_weights), n, p=status_weights),
+            'Fulfilment': (rng.random(n) >= AMAZON_SHARE).astype(np.int64),
+            'Category': rng.choice(categories, n, p=zipf_weights(categories, skew)),
+            'state': rng.choice(states, n, p=zipf_weights(states, skew))
+        }
+        order_count = rng.geometric(0.15, n)
+        cancelled = codes['Status'] == cancelled_code
+        qty = np.where(cancelled, rng.binomial(order_count, 0.1), rng.binomial(order_count, 0.97))
+        amount = np.where(cancelled & (qty == 0), 0.0,
+                          np.round(order_count * prices[codes['Category']] * rng.lognormal(0, 0.3, n), 2))
+
+        df = pd.DataFrame({
+            'year_month': pd.Categorical([str(month)] * n),
+            'year_week': pd.Categorical.from_codes(pd.factorize(weeks)[0][day_ids], pd.unique(weeks)),
+            # categories in alphabetical order, so the merged rows are sorted like the processed data
+            **{column: pd.Categorical.from_codes(codes[column], names[column]).reorder_categories(sorted(names[column]))
+               for column in codes},
+            'is_promotion': rng.random(n) < PROMOTION_SHARE,
+            'Qty': qty,
+            'order_count': order_count,
+            'Amount': amount
+        })
+        # merge the rows drawn on the same dimensions, as the summary of the raw data does
+        merged = df.groupby(dimensions, observed=True)[['Qty', 'order_count', 'Amount']].sum().reset_index()
+        for column in dimensions[:-1]:
+            merged[column] = merged[column].astype(str)
+        frames.append(merged)
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic sales data for the dashboard")
+    parser.add_argument('--rows', type=int, required=True, help="number of rows to draw")
+    parser.add_argument('--months', type=int, default=3, help="number of months")
+    parser.add_argument('--start', default='2022-04', help="first month")
+    parser.add_argument('--states', type=int, default=len(STATES), help="number of states")
+    parser.add_argument('--categories', type=int, default=len(CATEGORY_PRICES), help="number of categories")
+    parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent of states and categories")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--output', default='data/synthetic/amazon_in_sales.parquet', help="parquet file to write")
+    parser.add_argument('--partitioned', action='store_true',
+                        help="write a dataset partitioned by month to the --output directory")
+    args = parser.parse_args()
+
+    df = generate_sales_data(args.rows, args.months, args.start, args.states, args.categories, args.skew, args.seed)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    if args.partitioned:
+        from clean_raw_data import write_partitioned  # next to this script
+        write_partitioned(df, args.output, 65536)
+    else:
+        df.to_parquet(args.output, index=False)
+    print(f"Wrote {len(df):,} rows to {args.output}")
@@ -0,0 +1,389 @@
+"""
+This script load-tests a running dashboard through its Dash callback endpoint. It
+is not part of the Dash dashboard files; run it against gunicorn to find the
+number of concurrent users a deployment can serve before users find it for us.
+
+Every virtual user opens the dashboard and then repeats interactions picked at
+random: dragging the month or week range slider, switching the time granularity,
+ticking a status, switching the fulfilment or promotion filter and clicking a
+state on the map (clicking it again often). The filter spec is built as the
+browser does (src/assets/callbacks.js) from the components of the served layout,
+found by their ids in src/components.py, and every server callback consuming it
+is requested in parallel, with the figure structures the browser would hold, so
+charts are patched or rebuilt as in a real session. Background callbacks are
+polled for their result like the browser does, so their latency includes the polling.
+
+The report gives, per callback, the throughput, the latency percentiles, the
+mean response size and the error rate.
+
+Usage: gunicorn src.app:server --workers 4 &
+       python utils/load_test.py [--url http://127.0.0.1:8000] [--users 10] [--duration 60]
+       [--think 1.0] [--seed 0] [--output report.csv]
+"""
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import requests
+
+# Store of the filter spec, the input of every data callback
+FILTER_STORE = "filter_condition"
+
+# Components of src/components.py the filter spec is built from
+DATE_SLIDER = "date-slider"
+WEEK_SLIDER = "week-range-slider"
+PROMOTION_TOGGLE = "promotion-toggle"
+FULFILMENT_RADIO = "fulfillment-radio"
+STATUS_CHECKBOX = "status-checkbox"
+TIME_RADIO = "time_granularity"
+MAP = "map"
+
+# Interactions of a virtual user and their relative frequency
+INTERACTIONS = {
+    'drag_month_slider': 4,
+    'drag_week_slider': 3,
+    'toggle_granularity': 2,
+    'toggle_status': 2,
+    'switch_fulfilment': 1,
+    'toggle_promotion': 1,
+    'click_map': 3
+}
+
+# Properties of the components in a Dash layout, by id
+def component_props(layout):
+    """
+    Collect the properties of every component with an id in the JSON of a Dash layout.
+
+    Args:
+        layout (dict): Layout served at /_dash-layout.
+
+    Returns:
+        dict: Mapping of component id to its properties.
+    """
+    props = {}
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            if 'props' in node and 'type' in node:
+                if 'id' in node['props']:
+                    props[node['props']['id']] = node['props']
+                stack.append(node['props'].get('children'))
+    return props
+
+# Outputs of a callback from its output string
+def parse_outputs(output):
+    """
+    Split the output string of a callback dependency into its outputs.
+
+    Args:
+        output (str): e.g. "metric-1.children" or "..sales.figure...sales-structure.data..".
+
+    Returns:
+        list: One {"id", "property"} dict per output.
+    """
+    outputs = output[2:-2].split('...') if output.startswith('..') else [output]
+    return [dict(zip(['id', 'property'], item.rsplit('.', 1))) for item in outputs]
+
+# Filter spec built by the browser from the filter values
+def build_filter_spec(values, max_month, max_week):
+    """
+    Build the filter spec like buildFilterSpec in src/assets/callbacks.js.
+
+    Args:
+        values (dict): Filter values of a session, by component id.
+        max_month (int): Largest index of the month slider.
+        max_week (int): Largest index of the week slider.
+
+    Returns:
+        dict: Serialized filter spec, None for an invalid range.
+    """
+    monthly = values[TIME_RADIO] == "Monthly"
+    start, end = values[DATE_SLIDER] if monthly else values[WEEK_SLIDER]
+    if start < 0 or end > (max_month if monthly else max_week) or start > end:
+        return None
+    click_data = values[MAP]
+    return {
+        "granularity": values[TIME_RADIO],
+        "start": start,
+        "end": end,
+        "promo": bool(values[PROMOTION_TOGGLE]),
+        "fulfilment": values[FULFILMENT_RADIO],
+        "statuses": sorted(set(values[STATUS_CHECKBOX])),
+        "state": click_data["points"][0]["location"] if click_data else None
+    }
+
+class Dashboard:
+    """
+    What a browser learns from the served dashboard: the data callbacks, the
+    initial filter values and the choices of every filter.
+    """
+
+    def __init__(self, url):
+        """
+        Args:
+            url (str): Base URL of the running dashboard.
+        """
+        self.url = url.rstrip('/')
+        props = component_props(requests.get(f"{self.url}/_dash-layout", timeout=60).json())
+        dependencies = requests.get(f"{self.url}/_dash-dependencies", timeout=60).json()
+
+        # server callbacks fired by a filter change
+        self.callbacks = [dependency for dependency in dependencies
+                          if not dependency.get('clientside_function') and
+                          any(item['id'] == FILTER_STORE for item in dependency['inputs'])]
+        self.initial_values = {component: props[component].get('value')
+                               for component in [DATE_SLIDER, WEEK_SLIDER, PROMOTION_TOGGLE, FULFILMENT_RADIO,
+                                                 STATUS_CHECKBOX, TIME_RADIO]}
+        self.initial_values[MAP] = None
+        self.max_month = props[DATE_SLIDER]['max']
+        self.max_week = props[WEEK_SLIDER]['max']
+        self.statuses = [option['value'] for option in props[STATUS_CHECKBOX]['options']]
+        self.fulfilments = [option['value'] for option in props[FULFILMENT_RADIO]['options']]
+        self.states = props[MAP]['figure']['data'][0]['locations']
+
+    def name(self, callback):
+        """
+        Readable name of a callback: its outputs.
+
+        Args:
+            callback (dict): Callback dependency.
+
+        Returns:
+            str: Outputs of the callback, e.g. "sales.figure, sales-structure.data".
+        """
+        return ', '.join(f"{output['id']}.{output['property']}" for output in parse_outputs(callback['output']))
+
+class VirtualUser:
+    """
+    One browser session: the filter values, the stores the callbacks read as
+    state, and the interactions changing them.
+    """
+
+    def __init__(self, dashboard, rng):
+        """
+        Args:
+            dashboard (Dashboard): The served dashboard.
+            rng (random.Random): Random generator of the session.
+        """
+        self.dashboard = dashboard
+        self.rng = rng
+        self.values = dict(dashboard.initial_values)
+        self.stores = {}
+        self.http = requests.Session()
+
+    def _range(self, maximum):
+        # a range dragged to new ends, often short ones
+        start = self.rng.randint(0, maximum)
+        return [start, min(maximum, start + int(self.rng.expovariate(1 / 3)))]
+
+    def interact(self):
+        """
+        Change the filter values like one interaction of a user.
+
+        Returns:
+            str: Name of the interaction.
+        """
+        dashboard = self.dashboard
+        interaction = self.rng.choices(list(INTERACTIONS), weights=list(INTERACTIONS.values()))[0]
+        if interaction == 'drag_month_slider':
+            self.values[TIME_RADIO] = "Monthly"
+            self.values[DATE_SLIDER] = self._range(dashboard.max_month)
+        elif interaction == 'drag_week_slider':
+            self.values[TIME_RADIO] = "Weekly"
+            self.values[WEEK_SLIDER] = self._range(dashboard.max_week)
+        elif interaction == 'toggle_granularity':
+            self.values[TIME_RADIO] = "Weekly" if self.values[TIME_RADIO] == "Monthly" else "Monthly"
+        elif interaction == 'toggle_status':
+            status = self.rng.choice(dashboard.statuses)
+            statuses = set(self.values[STATUS_CHECKBOX])
+            self.values[STATUS_CHECKBOX] = list(statuses ^ {status})
+        elif interaction == 'switch_fulfilment':
+            self.values[FULFILMENT_RADIO] = self.rng.choice(dashboard.fulfilments)
+        elif interaction == 'toggle_promotion':
+            self.values[PROMOTION_TOGGLE] = not self.values[PROMOTION_TOGGLE]
+        else:
+            # the same state is often clicked again, the most populous states most often
+            clicked = self.values[MAP]
+            if clicked is None or self.rng.random() < 0.5:
+                state = dashboard.states[min(int(self.rng.expovariate(1 / 5)), len(dashboard.states) - 1)]
+            else:
+                state = clicked['points'][0]['location']
+            self.values[MAP] = {"points": [{"location": state}]}
+        return interaction
+
+    def payload(self, callback, filter_spec):
+        """
+        Body of the request of a callback, as sent by the browser.
+
+        Args:
+            callback (dict): Callback dependency.
+            filter_spec (dict): Serialized filter spec.
+
+        Returns:
+            dict: JSON body of the request.
+        """
+        outputs = parse_outputs(callback['output'])
+        return {
+            "output": callback['output'],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [{**item, "value": filter_spec} for item in callback['inputs']],
+            "changedPropIds": [f"{FILTER_STORE}.data"],
+            "state": [{**item, "value": self.stores.get((item['id'], item['property']))}
+                      for item in callback['state']]
+        }
+
+    def request(self, callback, filter_spec):
+        """
+        Request one callback and keep the stores it updates.
+
+        Args:
+            callback (dict): Callback dependency.
+            filter_spec (dict): Serialized filter spec.
+
+        Returns:
+            dict: Measurement of the request.
+        """
+        url = f"{self.dashboard.url}/_dash-update-component"
+        payload = self.payload(callback, filter_spec)
+        start = time.perf_counter()
+        try:
+            response = self.http.post(url, json=payload, timeout=60)
+            # a background callback answers with its job, the browser polls for the result
+            job = response.json() if response.status_code == 200 and callback.get('long') else {}
+            while 'job' in job and 'response' not in job:
+                time.sleep(callback['long']['interval'] / 1000)
+                response = self.http.post(url, json=payload, params={'cacheKey': job['cacheKey'], 'job': job['job']},
+                                          timeout=60)
+                job = {**job, **response.json()} if response.status_code == 200 else {}
+            latency = (time.perf_counter() - start) * 1000
+            # 204: the callback prevented the update
+            error = None if response.status_code in (200, 204) else f"HTTP {response.status_code}"
+            if response.status_code == 200:
+                updates = response.json().get('response', {})
+                for item in callback['state']:
+                    if item['property'] in updates.get(item['id'], {}):
+                        self.stores[(item['id'], item['property'])] = updates[item['id']][item['property']]
+            size = len(response.content)
+        except requests.RequestException as e:
+            latency, size, error = (time.perf_counter() - start) * 1000, 0, type(e).__name__
+        return {'callback': self.dashboard.name(callback), 'latency_ms': latency, 'response_bytes': size,
+                'error': error}
+
+    def filter_change(self, pool):
+        """
+        Request every data callback for the current filter values, in parallel like the browser.
+
+        Args:
+            pool (ThreadPoolExecutor): Pool sending the requests.
+
+        Returns:
+            list: Measurements of the requests.
+        """
+        filter_spec = build_filter_spec(self.values, self.dashboard.max_month, self.dashboard.max_week)
+        futures = [pool.submit(self.request, callback, filter_spec) for callback in self.dashboard.callbacks]
+        return [future.result() for future in futures]
+
+# Run the virtual users for a duration
+def run_load(dashboard, users, duration, think, seed):
+    """
+    Run concurrent virtual users against the dashboard.
+
+    Args:
+        dashboard (Dashboard): The served dashboard.
+        users (int): Number of concurrent users.
+        duration (float): Seconds to run for.
+        think (float): Mean pause of a user between interactions, in seconds.
+        seed (int): Seed of the random generators of the users.
+
+    Returns:
+        tuple: Measurements of every request (pd.DataFrame) and the elapsed seconds.
+    """
+    measurements = []
+    lock = threading.Lock()
+    pool = ThreadPoolExecutor(users * len(dashboard.callbacks))
+    deadline = time.perf_counter() + duration
+
+    def session(user_id):
+        rng = random.Random(seed * 100003 + user_id)
+        user = VirtualUser(dashboard, rng)
+        # first page load, every chart is rendered in full
+        interaction = 'open_dashboard'
+        while time.perf_counter() < deadline:
+            results = user.filter_change(pool)
+            with lock:
+                measurements.extend({**result, 'user': user_id, 'interaction': interaction} for result in results)
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+            interaction = user.interact()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(user_id,)) for user_id in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return pd.DataFrame(measurements), elapsed
+
+# Summarize the measurements per callback
+def summarize(measurements, elapsed):
+    """
+    Throughput, latency percentiles, response size and error rate per callback.
+
+    Args:
+        measurements (pd.DataFrame): Measurements of every request.
+        elapsed (float): Seconds the load ran for.
+
+    Returns:
+        pd.DataFrame: One row per callback, plus the overall row.
+    """
+    def stats(group):
+        ok = group[group['error'].isna()]
+        return pd.Series({
+            'requests': len(group),
+            'throughput_rps': len(group) / elapsed,
+            'error_rate': 1 - len(ok) / len(group),
+            'p50_ms': ok['latency_ms'].quantile(0.5),
+            'p90_ms': ok['latency_ms'].quantile(0.9),
+            'p99_ms': ok['latency_ms'].quantile(0.99),
+            'max_ms': ok['latency_ms'].max(),
+            'mean_kb': ok['response_bytes'].mean() / 1024
+        })
+
+    report = pd.DataFrame({callback: stats(group) for callback, group in measurements.groupby('callback')}).T
+    report.loc['all callbacks'] = stats(measurements)
+    report['requests'] = report['requests'].astype(int)
+    return report.rename_axis('callback')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test of the dashboard callbacks")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="base URL of the running dashboard")
+    parser.add_argument('--users', type=int, default=10, help="number of concurrent users")
+    parser.add_argument('--duration', type=float, default=60, help="seconds to run for")
+    parser.add_argument('--think', type=float, default=1.0,
+                        help="mean pause between interactions in seconds, 0 for back-to-back interactions")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--output', help="write every request to this CSV file")
+    args = parser.parse_args()
+
+    dashboard = Dashboard(args.url)
+    print(f"{args.users} users for {args.duration:g}s, {len(dashboard.callbacks)} callbacks per filter change")
+    measurements, elapsed = run_load(dashboard, args.users, args.duration, args.think, args.seed)
+    if measurements.empty:
+        raise SystemExit("No request was sent")
+
+    pd.set_option('display.width', 200)
+    print(summarize(measurements, elapsed).round(3).to_string())
+    errors = measurements['error'].dropna()
+    if not errors.empty:
+        print(errors.value_counts().to_string())
+    if args.output:
+        measurements.to_csv(args.output, index=False)
+        print(f"Wrote {args.output}")
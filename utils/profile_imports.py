@@ -0,0 +1,57 @@
+"""
+This script reports the import-time cost of the dashboard, per module and per
+top-level package, using `python -X importtime`. It is not part of the Dash
+dashboard files; run it to spot slow imports before they reach the cold start
+of new workers.
+
+Usage: python utils/profile_imports.py [--module src.app] [--top 25] [--budget 3000] [--output report.csv]
+"""
+
+import argparse
+import subprocess
+import sys
+import pandas as pd
+
+parser = argparse.ArgumentParser(description="Import-time profile of the dashboard")
+parser.add_argument('--module', default='src.app', help="module to import")
+parser.add_argument('--top', type=int, default=25, help="number of modules to list")
+parser.add_argument('--budget', type=float, help="fail if the total import time exceeds this many ms")
+parser.add_argument('--output', help="write the per-module report to this CSV file")
+args = parser.parse_args()
+
+# -X importtime writes one line per imported module to stderr:
+# "import time: self [us] | cumulative | imported package", nested imports are indented
+result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {args.module}'],
+                        capture_output=True, text=True)
+if result.returncode != 0:
+    sys.exit(result.stderr)
+
+rows = []
+for line in result.stderr.splitlines():
+    if not line.startswith('import time:') or line.endswith('imported package'):
+        continue
+    self_us, cumulative_us, name = line[len('import time:'):].split('|')
+    rows.append({
+        'module': name.strip(),
+        'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+        'self_ms': int(self_us) / 1000,
+        'cumulative_ms': int(cumulative_us) / 1000
+    })
+report = pd.DataFrame(rows)
+report['package'] = report['module'].str.split('.').str[0]
+total_ms = report.loc[report['depth'] == 0, 'cumulative_ms'].sum()
+
+pd.set_option('display.width', 120)
+print(f"Importing {args.module} took {total_ms:.0f} ms over {len(report)} modules\n")
+print("By top-level package (self time of all its modules):")
+print(report.groupby('package')['self_ms'].sum().sort_values(ascending=False).head(args.top).round(1).to_string())
+print("\nSlowest modules (self time, including module-level work such as loading data):")
+print(report.sort_values('self_ms', ascending=False).head(args.top)[['module', 'self_ms', 'cumulative_ms']]
+      .round(1).to_string(index=False))
+
+if args.output:
+    report.to_csv(args.output, index=False)
+    print(f"\nWrote {args.output}")
+
+if args.budget is not None and total_ms > args.budget:
+    sys.exit(f"Import time {total_ms:.0f} ms exceeds the budget of {args.budget:.0f} ms")
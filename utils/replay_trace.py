@@ -0,0 +1,215 @@
+"""
+This script replays a trace of real callback inputs, recorded by the dashboard
+with DASHBOARD_TRACE set, against a build of the dashboard. It is not part of the
+Dash dashboard files; run it to check a release is no slower than the previous
+one on the traffic of its users, and gives the same outputs.
+
+The callbacks are called in the order of the trace in a fresh process of the
+build (its own checkout directory), with the figure cache starting empty and no
+warmup, as in a new worker. The latency and a digest of the outputs of every
+call are written to --output; --compare diffs them with the results of another
+build on the same trace: the median and p90 latency of every callback and the
+calls whose outputs differ.
+
+Usage: python utils/replay_trace.py trace.jsonl [--build ../dashboard-previous] [--days 7]
+       [--limit 10000] [--output results.csv] [--compare baseline.csv] [--tolerance 1.2]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+# Records of a trace, optionally the most recent ones only
+def read_trace(path, days=None, limit=None):
+    """
+    Read the records of a trace file, skipping truncated lines.
+
+    Args:
+        path (str): File path of the trace.
+        days (float): Only keep the records of the last `days` days of the trace.
+        limit (int): Only keep the last `limit` records.
+
+    Returns:
+        list: Records with the time ("t"), the callback name ("cb") and its arguments ("args").
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:  # truncated line of a worker stopped while writing
+                continue
+    if days is not None and records:
+        since = records[-1]['t'] - days * 24 * 3600
+        records = [record for record in records if record['t'] >= since]
+    if limit is not None:
+        records = records[-limit:]
+    return records
+
+# Digest of the outputs of a callback
+def output_digest(outputs):
+    """
+    Digest of callback outputs, the same for equal outputs whatever their types,
+    e.g. a figure or the JSON of a cached figure.
+
+    Args:
+        outputs: Return value of a callback.
+
+    Returns:
+        str: Hex digest.
+    """
+    from plotly.io.json import to_json_plotly
+
+    canonical = json.dumps(json.loads(to_json_plotly(outputs)), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+# Replay the trace in the build, run in a fresh process
+def run_child(trace_path, days, limit):
+    """
+    Call the callbacks of the trace in the build of the working directory and
+    print the latency and output digest of every call as JSON lines.
+
+    Args:
+        trace_path (str): File path of the trace.
+        days (float): Only replay the last `days` days of the trace.
+        limit (int): Only replay the last `limit` records.
+    """
+    sys.path.insert(0, os.getcwd())
+    os.environ['DASHBOARD_WARMUP'] = '0'
+    # a cache of its own, removed when the replay ends
+    with tempfile.TemporaryDirectory(prefix='dashboard-replay-') as cache_dir:
+        os.environ['DASHBOARD_CACHE_DIR'] = cache_dir
+        # the replay must not record itself, log specs or ingest batches
+        for variable in ['DASHBOARD_TRACE', 'DASHBOARD_SPEC_LOG', 'DASHBOARD_INBOX']:
+            os.environ.pop(variable, None)
+        from src import app, callbacks
+
+        for i, record in enumerate(read_trace(trace_path, days, limit)):
+            callback = getattr(callbacks, record['cb'], None)
+            if callback is None:
+                print(json.dumps({'request': i, 'callback': record['cb'], 'error': 'unknown callback'}), flush=True)
+                continue
+            start = time.perf_counter()
+            try:
+                outputs = callback(*record['args'])
+            except Exception as e:
+                print(json.dumps({'request': i, 'callback': record['cb'], 'error': repr(e)}), flush=True)
+                continue
+            latency = (time.perf_counter() - start) * 1000
+            print(json.dumps({'request': i, 'callback': record['cb'], 'latency_ms': latency,
+                              'digest': output_digest(outputs), 'error': None}), flush=True)
+
+# Replay the trace in a build
+def replay(trace_path, build, days, limit):
+    """
+    Replay the trace in a fresh process of a build and collect its results.
+
+    Args:
+        trace_path (str): File path of the trace.
+        build (str): Checkout directory of the build.
+        days (float): Only replay the last `days` days of the trace.
+        limit (int): Only replay the last `limit` records.
+
+    Returns:
+        pd.DataFrame: One row per replayed call.
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--child', os.path.abspath(trace_path)]
+    if days is not None:
+        command += ['--days', str(days)]
+    if limit is not None:
+        command += ['--limit', str(limit)]
+    child = subprocess.run(command, cwd=build, capture_output=True, text=True)
+    if child.returncode != 0:
+        sys.exit(child.stderr)
+    results = [json.loads(line) for line in child.stdout.splitlines() if line.startswith('{')]
+    return pd.DataFrame(results, columns=['request', 'callback', 'latency_ms', 'digest', 'error'])
+
+# Latency percentiles of the replayed calls per callback
+def summarize(results):
+    """
+    Number of calls, errors and latency percentiles per callback.
+
+    Args:
+        results (pd.DataFrame): Results of a replay.
+
+    Returns:
+        pd.DataFrame: One row per callback.
+    """
+    return results.groupby('callback').agg(
+        calls=('request', 'size'),
+        errors=('error', 'count'),
+        median_ms=('latency_ms', 'median'),
+        p90_ms=('latency_ms', lambda latencies: latencies.quantile(0.9)),
+        max_ms=('latency_ms', 'max'))
+
+# Compare the results to those of another build on the same trace
+def compare(results, baseline, tolerance):
+    """
+    Find the callbacks slower than the baseline and the calls whose outputs differ.
+
+    Args:
+        results (pd.DataFrame): Results of this build.
+        baseline (pd.DataFrame): Results of another build on the same trace.
+        tolerance (float): Allowed ratio of the latency of this build to the baseline's.
+
+    Returns:
+        tuple: Latencies of both builds per callback with a "slower" column
+            (pd.DataFrame), and the calls whose outputs differ (pd.DataFrame).
+    """
+    latencies = summarize(results)[['median_ms', 'p90_ms']].join(
+        summarize(baseline)[['median_ms', 'p90_ms']], rsuffix='_baseline', how='inner')
+    latencies['median_ratio'] = latencies['median_ms'] / latencies['median_ms_baseline']
+    latencies['p90_ratio'] = latencies['p90_ms'] / latencies['p90_ms_baseline']
+    latencies['slower'] = (latencies['median_ratio'] > tolerance) | (latencies['p90_ratio'] > tolerance)
+
+    # missing digests and error messages compare as empty strings
+    calls = results.fillna({'digest': '', 'error': ''}).merge(
+        baseline.fillna({'digest': '', 'error': ''}), on=['request', 'callback'], suffixes=('', '_baseline'))
+    differ = calls[(calls['digest'] != calls['digest_baseline']) | (calls['error'] != calls['error_baseline'])]
+    return latencies, differ[['request', 'callback', 'digest_baseline', 'digest', 'error_baseline', 'error']]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a trace of callback inputs against a build of the dashboard")
+    parser.add_argument('trace', nargs='?', help="trace file recorded with DASHBOARD_TRACE")
+    parser.add_argument('--build', default='.', help="checkout directory of the build to replay against")
+    parser.add_argument('--days', type=float, help="only replay the last days of the trace")
+    parser.add_argument('--limit', type=int, help="only replay the last records of the trace")
+    parser.add_argument('--output', help="write the result of every call to this CSV file")
+    parser.add_argument('--compare', help="fail if slower than, or outputs differ from, these results")
+    parser.add_argument('--tolerance', type=float, default=1.2, help="allowed slowdown over the baseline")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.days, args.limit)
+        sys.exit()
+    if not args.trace:
+        parser.error("the trace file is required")
+
+    results = replay(args.trace, args.build, args.days, args.limit)
+    pd.set_option('display.width', 200)
+    print(f"Replayed {len(results):,} calls against {os.path.abspath(args.build)}")
+    print(summarize(results).round(1).to_string())
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        baseline = pd.read_csv(args.compare, dtype={'digest': str, 'error': str})
+        latencies, differ = compare(results, baseline, args.tolerance)
+        print(latencies.round(2).to_string())
+        if not differ.empty:
+            print(differ.head(20).to_string(index=False))
+        failures = []
+        if latencies['slower'].any():
+            failures.append(f"{int(latencies['slower'].sum())} callbacks are more than {args.tolerance}x slower")
+        if not differ.empty:
+            failures.append(f"{len(differ)} calls have different outputs")
+        if failures:
+            sys.exit(", ".join(failures) + " than the baseline")
+        print(f"No callback is more than {args.tolerance}x slower than the baseline and all outputs match")
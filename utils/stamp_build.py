@@ -0,0 +1,32 @@
+"""
+This script stamps build-time metadata into src/build_info.json, so the dashboard
+shows the date of the latest commit without opening the git repository at startup.
+It is not part of the Dash dashboard files and runs in the deployment build step.
+
+Usage: python utils/stamp_build.py [branch]
+"""
+
+import json
+import subprocess
+import sys
+from datetime import datetime
+
+branch = sys.argv[1] if len(sys.argv) > 1 else 'main'
+output_path = 'src/build_info.json'
+
+# fall back to the checked out commit if the branch is not available, e.g. in a shallow clone
+for ref in [branch, 'HEAD']:
+    result = subprocess.run(['git', 'log', '-1', '--format=%H %ct', ref], capture_output=True, text=True)
+    if result.returncode == 0:
+        break
+    print(f"Could not read {ref}: {result.stderr.strip()}")
+result.check_returncode()
+
+commit, timestamp = result.stdout.split()
+build_info = {
+    "commit": commit,
+    "commit_date": datetime.fromtimestamp(int(timestamp)).strftime("%B %d, %Y")
+}
+with open(output_path, 'w') as f:
+    json.dump(build_info, f, indent=2)
+print(f"{output_path}: {build_info}")